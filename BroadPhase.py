@@ -0,0 +1,277 @@
+import math
+import numpy as np
+from UniformGrid import UniformGrid, grid_cost
+from SweepAndPrune import SweepAndPrune
+from kdtree import ArrayKDTree
+from HierarchicalGrid import HierarchicalGrid
+
+# Constants
+brute_force_limit = 128
+select_interval = 30
+
+class BroadPhase:
+    # Interface of the array broad-phases. rebuild() takes the current state,
+    # candidate_pairs() then returns unordered (i < j) pairs that include
+    # every pair closer than `reach(radius)` between centers, and
+    # query_region() the particles whose bounding boxes touch a box.
+    # `margin` widens the search so a NeighborList skin fits in the reach.
+    name = None
+
+    def __init__(self, margin=0.0):
+        self.margin = margin
+        self.pos = np.zeros((0, 2))
+        self.radius = np.zeros(0)
+        self.candidates = 0
+
+    def rebuild(self, pos, radius):
+        self.pos = pos
+        self.radius = radius
+
+    def reach(self, radius):
+        largest = radius.max() if len(radius) else 0
+        return 2 * largest + self.margin
+
+    def candidate_pairs(self):
+        raise NotImplementedError
+
+    def query_region(self, low, high):
+        raise NotImplementedError
+
+    def touching(self, index, low, high):
+        # Members of `index` whose bounding boxes touch [low, high]
+        pos, radius = self.pos[index], self.radius[index][:, None]
+        inside = ((pos + radius >= low) & (pos - radius <= high)).all(axis=1)
+        return index[inside]
+
+    def count(self, i, j):
+        self.candidates += len(i)
+        return i, j
+
+
+class BruteForce(BroadPhase):
+    # Every pair, for a handful of particles where building anything costs
+    # more than testing them all
+    name = "brute"
+
+    def candidate_pairs(self):
+        i, j = np.triu_indices(len(self.pos), 1)
+        return self.count(i, j)
+
+    def query_region(self, low, high):
+        return self.touching(np.arange(len(self.pos)), np.asarray(low), np.asarray(high))
+
+
+class GridBroadPhase(BroadPhase):
+    # UniformGrid: pairs from the 3x3 cell neighborhoods
+    name = "grid"
+
+    def __init__(self, width, height, grid_size, margin=0.0, grid=None):
+        super().__init__(margin)
+        self.grid = UniformGrid(width, height, grid_size) if grid is None else grid
+
+    def rebuild(self, pos, radius):
+        # A 3x3 search misses pairs of particles wider than a cell
+        if 2 * radius.max(initial=0) > self.grid.grid_size:
+            raise ValueError(f"grid cells of {self.grid.grid_size} are smaller than the largest particle, {2 * radius.max():g} across")
+        super().rebuild(pos, radius)
+        self.grid.rebuild(pos)
+
+    def reach(self, radius):
+        return self.grid.grid_size
+
+    def candidate_pairs(self):
+        return self.count(*self.grid.candidate_pairs())
+
+    def query_region(self, low, high):
+        low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+        largest = self.radius.max() if len(self.radius) else 0
+        return self.touching(self.grid.query_box(low - largest, high + largest), low, high)
+
+
+class HierarchicalGridBroadPhase(BroadPhase):
+    # HierarchicalGrid: a grid level per size class, for mixed radii
+    name = "hgrid"
+
+    def __init__(self, width, height, margin=0.0):
+        super().__init__(margin)
+        self.hgrid = HierarchicalGrid(width, height, margin)
+
+    def rebuild(self, pos, radius):
+        super().rebuild(pos, radius)
+        self.hgrid.rebuild(pos, radius)
+
+    def candidate_pairs(self):
+        return self.count(*self.hgrid.candidate_pairs())
+
+    def query_region(self, low, high):
+        low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+        return self.touching(self.hgrid.query_box(low, high), low, high)
+
+    def stats(self):
+        return self.hgrid.stats()
+
+
+class KDTreeBroadPhase(BroadPhase):
+    # ArrayKDTree, refitted between steps and rebuilt when particles are
+    # added. Does not depend on the world size, so it suits a few particles
+    # spread over a large world.
+    name = "kdtree"
+
+    def __init__(self, margin=0.0):
+        super().__init__(margin)
+        self.tree = None
+
+    def rebuild(self, pos, radius):
+        super().rebuild(pos, radius)
+        if self.tree is None or len(self.tree.pos) != len(pos):
+            self.tree = ArrayKDTree(pos)
+        else:
+            self.tree.refit(pos)
+
+    def candidate_pairs(self):
+        if len(self.pos) == 0:
+            return self.count(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        query, found = self.tree.query_batch(self.pos, self.radius + self.radius.max() + self.margin)
+        keep = query < found
+        return self.count(query[keep], found[keep])
+
+    def query_region(self, low, high):
+        low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+        if len(self.pos) == 0:
+            return np.zeros(0, dtype=np.int64)
+        # The circle around the box grown by the largest radius, then the
+        # exact box test
+        center = (low + high) / 2
+        extent = np.hypot(*(high - low + 2 * self.radius.max())) / 2
+        _, found = self.tree.query_batch(center[None], extent)
+        return self.touching(found, low, high)
+
+
+class SweepBroadPhase(BroadPhase):
+    # SweepAndPrune along x: intervals stay almost sorted between steps, so
+    # it is cheap while particles do not pile up in the same columns
+    name = "sweep"
+
+    def __init__(self, margin=0.0):
+        super().__init__(margin)
+        self.sweep = SweepAndPrune()
+        self.lower = np.zeros(0)
+
+    def rebuild(self, pos, radius):
+        super().rebuild(pos, radius)
+        self.lower = self.sweep.update(pos, radius + self.margin / 2)
+
+    def candidate_pairs(self):
+        i, j = self.sweep.pairs(self.pos, self.radius + self.margin / 2)
+        return self.count(np.minimum(i, j), np.maximum(i, j))
+
+    def query_region(self, low, high):
+        low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+        largest = self.radius.max() if len(self.radius) else 0
+        # Sorted by lower end, so the intervals reaching the box are a slice
+        start = np.searchsorted(self.lower, low[0] - 2 * largest - self.margin)
+        end = np.searchsorted(self.lower, high[0], side="right")
+        return self.touching(self.sweep.order[start:end], low, high)
+
+
+class AutoBroadPhase(BroadPhase):
+    # Picks a broad-phase from the particle count and how the particles are
+    # spread, and re-checks every `select_interval` rebuilds or when the
+    # count halves or doubles. Brute force takes the smallest scenes, above
+    # that the grid and sweep and prune are compared with a cost model
+    # measured on this engine (see select()). When the radii span more than
+    # one power of two the hierarchical grid stands in for the grid, whose
+    # cells would have to fit the largest particles. The KD-tree is slower
+    # than one of the others on every scene we measured, so it is only used
+    # on request.
+    name = "auto"
+
+    def __init__(self, width, height, grid_size, margin=0.0, grid=None):
+        super().__init__(margin)
+        self.options = {
+            "brute": BruteForce(margin),
+            "grid": GridBroadPhase(width, height, grid_size, margin, grid),
+            "hgrid": HierarchicalGridBroadPhase(width, height, margin),
+            "sweep": SweepBroadPhase(margin),
+        }
+        self.current = self.options["grid"]
+        self.selected_count = 0
+        self.rebuilds = 0
+        self.switches = 0
+
+    def select(self, pos, radius):
+        # Costs in units of one empty grid cell, see grid_cost. The sweep
+        # pays for the pairs whose x intervals overlap, which piles and dense
+        # scenes drive up quadratically.
+        count = len(pos)
+        if count <= brute_force_limit:
+            return "brute"
+        grid = self.options["grid"].grid
+        name, size, cols, rows = "grid", grid.grid_size, grid.cols, grid.rows
+        reach = 2 * radius + self.margin
+        if reach.max() > 2 * reach.min() or 2 * radius.max() > size:
+            # Costed as if every particle were in the finest level. Also
+            # when the grid's cells are too small for the largest particles.
+            name, size = "hgrid", math.ceil(reach.min())
+            cols, rows = -(-grid.width // size), -(-grid.height // size)
+        cells = (pos // size).astype(np.int64)
+        _, per_cell = np.unique(cells[:, 0] * rows + cells[:, 1], return_counts=True)
+        half = radius + self.margin / 2
+        order = np.argsort(pos[:, 0] - half)
+        lower = (pos[:, 0] - half)[order]
+        upper = (pos[:, 0] + half)[order]
+        overlaps = (np.searchsorted(lower, upper, side="right") - np.arange(1, count + 1)).sum()
+        # A cell's particles meet about 4.5 cells' worth of particles each
+        cost = grid_cost(cols * rows, count, 4.5 * (per_cell * per_cell).sum())
+        return name if cost <= 6 * overlaps else "sweep"
+
+    def rebuild(self, pos, radius):
+        super().rebuild(pos, radius)
+        count = len(pos)
+        if self.rebuilds % select_interval == 0 or not self.selected_count / 2 <= count <= 2 * self.selected_count:
+            name = self.select(pos, radius)
+            self.selected_count = count
+            if name != self.current.name:
+                self.current = self.options[name]
+                self.switches += 1
+        self.rebuilds += 1
+        self.current.rebuild(pos, radius)
+
+    def reach(self, radius):
+        # The smallest, a neighbor list built before a switch stays valid
+        return min(option.reach(radius) for option in self.options.values())
+
+    def candidate_pairs(self):
+        return self.count(*self.current.candidate_pairs())
+
+    def query_region(self, low, high):
+        return self.current.query_region(low, high)
+
+    def state(self):
+        # What rebuild() decides from, for checkpoints
+        return {"current": self.current.name, "selected_count": self.selected_count, "rebuilds": self.rebuilds, "switches": self.switches}
+
+    def load_state(self, state):
+        self.current = self.options[str(state["current"])]
+        self.selected_count = int(state["selected_count"])
+        self.rebuilds = int(state["rebuilds"])
+        self.switches = int(state["switches"])
+
+    def stats(self):
+        return {"current": self.current.name, "switches": self.switches, "rebuilds": self.rebuilds}
+
+
+def create_broad_phase(name, width, height, grid_size, margin=0.0, grid=None):
+    if name == "auto":
+        return AutoBroadPhase(width, height, grid_size, margin, grid)
+    if name == "grid":
+        return GridBroadPhase(width, height, grid_size, margin, grid)
+    if name == "hgrid":
+        return HierarchicalGridBroadPhase(width, height, margin)
+    if name == "kdtree":
+        return KDTreeBroadPhase(margin)
+    if name == "sweep":
+        return SweepBroadPhase(margin)
+    if name == "brute":
+        return BruteForce(margin)
+    raise ValueError(f"unknown broad phase {name!r}")
@@ -0,0 +1,87 @@
+import numpy as np
+
+# Constants
+# Pairs farther apart than this many contact distances are not resolved,
+# the corrections of one pass rarely bring them into contact
+near = 1.5
+
+class NarrowPhase:
+    # Resolves a batch of candidate pairs with the same position projection
+    # as Simulation.resolve_collision: each overlapping pair is pushed apart
+    # by half the overlap along the line between centers, measured on the
+    # positions the earlier pairs left (Gauss-Seidel). To do that with array
+    # operations the pairs are split into batches in which no particle
+    # appears twice; a batch is solved at once and sees every correction of
+    # the batches before it, so the result is that of the sequential loop in
+    # some pair order. Summing the corrections of all pairs measured on the
+    # same positions instead overshoots and a dense pile explodes, and
+    # averaging them leaves piles several times more compressed.
+    def __init__(self, relaxation=1.0):
+        self.relaxation = relaxation
+        self.pair_tests = 0
+        self.max_overlap = 0.0
+        self.overlaps = 0
+        self._first = np.zeros(0, dtype=np.int64)
+
+    def solve(self, pos, radius, i, j, weight=None):
+        # `weight` optionally splits each correction between the two particles
+        # in proportion to their weights, a zero weight holds a particle still
+        delta = pos[i] - pos[j]
+        distance_sq = delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1]
+        min_distance = radius[i] + radius[j]
+        hit = (distance_sq < min_distance * min_distance) & (distance_sq > 0)
+        self.pair_tests += len(i)
+        overlaps = int(hit.sum())
+        self.overlaps += overlaps
+        self.max_overlap = float((min_distance[hit] - np.sqrt(distance_sq[hit])).max(initial=0))
+
+        close = distance_sq < (near * min_distance) ** 2
+        i, j = i[close], j[close]
+        # Pair lists come in cell order, where the batches below would form
+        # long chains. They are shuffled by a hash of each pair, so the order,
+        # and the result, depends on the pairs and not on the broad phase
+        # that listed them. Multiplying by an odd constant is a bijection
+        # modulo 2^64, so no two pairs share a key.
+        key = i.astype(np.uint64) * np.uint64(len(pos)) + j.astype(np.uint64)
+        key *= np.uint64(0x9E3779B97F4A7C15)
+        shuffle = np.argsort(key)
+        i, j = i[shuffle], j[shuffle]
+        for batch_i, batch_j in self.batches(i, j, len(pos)):
+            self.project(pos, radius, batch_i, batch_j, weight)
+        return overlaps
+
+    def batches(self, i, j, count):
+        # Each round takes every pair that comes first, in list order, at both
+        # of its particles. The first pair left always does, so every round
+        # makes progress. Assigning in reverse leaves the first occurrence of
+        # each particle, numpy keeps the last value of a repeated index.
+        if len(self._first) < count:
+            self._first = np.zeros(count, dtype=np.int64)
+        first = self._first
+        index = np.arange(len(i))
+        while len(index):
+            first[np.column_stack((i, j)).ravel()[::-1]] = np.repeat(index, 2)[::-1]
+            free = (first[i] == index) & (first[j] == index)
+            yield i[free], j[free]
+            left = ~free
+            i, j, index = i[left], j[left], index[left]
+
+    def project(self, pos, radius, i, j, weight):
+        # No particle appears twice, so the rows can be updated in place. Only
+        # the rows of overlapping pairs are written: workers sharing `pos`
+        # each solve their own pairs and must not overwrite the others' rows.
+        delta = pos[i] - pos[j]
+        distance = np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+        min_distance = radius[i] + radius[j]
+        hit = (distance < min_distance) & (distance > 0)
+        i, j, delta, distance, min_distance = i[hit], j[hit], delta[hit], distance[hit], min_distance[hit]
+        correction = delta * (self.relaxation * (distance - min_distance) / distance)[:, None]
+        if weight is None:
+            share_i = share_j = 0.5
+        else:
+            total = weight[i] + weight[j]
+            total[total == 0] = 1
+            share_i = (weight[i] / total)[:, None]
+            share_j = (weight[j] / total)[:, None]
+        pos[i] -= correction * share_i
+        pos[j] += correction * share_j
@@ -0,0 +1,268 @@
+import time
+import numpy as np
+from Helper import Helper
+from ParticleArray import ParticleArray
+from UniformGrid import UniformGrid
+from BroadPhase import create_broad_phase
+from GridTuner import GridTuner
+from Collision import NarrowPhase
+from NeighborList import NeighborList
+from SleepTracker import SleepTracker
+from SubstepScheduler import SubstepScheduler
+
+# Constants
+width, height = 900, 900
+grid_size = 30
+gravity = (0, 9.81 * 100)
+skin = 5
+fixed_dt = 1 / 80
+max_steps = 4
+
+class Engine:
+    # Headless physics core. Has no pygame dependency, front-ends such as
+    # Renderer drive it through step() and inject input via apply_force().
+    # `broad_phase` is "grid", "hgrid", "kdtree", "sweep", "brute" or "auto", see
+    # BroadPhase.py. With tune_grid, `grid_size` is only the starting cell
+    # size and GridTuner picks it from then on.
+    def __init__(self, width, height, grid_size=grid_size, substeps=3, skin=skin, sleep=True, adaptive=True, broad_phase="grid", tune_grid=True):
+        self.width = width
+        self.height = height
+        self.particles = ParticleArray(width, height)
+        self.grid = UniformGrid(width, height, grid_size)
+        self.broad_phase = create_broad_phase(broad_phase, width, height, grid_size, skin, self.grid)
+        self.narrow_phase = NarrowPhase()
+        self.neighbor_list = NeighborList(skin) if skin else None
+        self.grid_tuner = GridTuner(skin) if tune_grid and broad_phase in ("grid", "auto") else None
+        self.sleep = SleepTracker() if sleep else None
+        self.gravity = np.array(gravity, dtype=float)
+        self.substeps = substeps
+        self.base_substeps = substeps
+        # `substeps` is only the starting count when the scheduler is on
+        self.scheduler = SubstepScheduler() if adaptive else None
+        self.displacement = 0.0
+        self.overlap = 0.0
+        self.time = 0.0
+        self.step_count = 0
+        self.forces = []
+        self.spawn = False
+        self.spawn_delay = 0.05
+        self.spawn_elapsed = 0.0
+        self.fixed_dt = fixed_dt
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped_time = 0.0
+        self.behind = False
+        self.last_pos = None
+
+    def add_particle(self, pos, radius, color, mass=1, velocity=(0, 0)):
+        i = self.particles.add(pos, radius, color, mass)
+        self.particles.add_velocity(velocity, i)
+        return i
+
+    def add_particles(self, pos, radius, color, mass=1, velocity=(0, 0)):
+        index = self.particles.add_many(pos, radius, color, mass)
+        self.particles.add_velocity(velocity, index)
+        return index
+
+    def apply_force(self, force):
+        # Applied to every particle on each substep of the next step only
+        self.forces.append(np.asarray(force, dtype=float))
+        if self.sleep is not None:
+            self.sleep.wake()
+
+    def spawn_particles(self):
+        color = Helper.get_color(len(self.particles))
+        # 4 pixels per substep at the starting substep count
+        speed = 4 * self.base_substeps / self.substeps
+        for y in (20, 40, 60):
+            self.add_particle((20, y), 10, color, velocity=(speed, 0))
+
+    def save_checkpoint(self, path):
+        # Uncompressed .npz: one array per particle field plus the clock,
+        # spawner, substep, sleep and broad-phase selection state
+        sleep = {}
+        if self.sleep is not None:
+            self.sleep.resize(len(self.particles))
+            sleep = {"asleep": self.sleep.asleep, "rest": self.sleep.rest, "island": self.sleep.island}
+        broad_phase = {}
+        if hasattr(self.broad_phase, "state"):
+            broad_phase = {f"broad_phase_{name}": value for name, value in self.broad_phase.state().items()}
+        # Through a file object, np.savez would add .npz to a bare path
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                **self.particles.state(),
+                **sleep,
+                **broad_phase,
+                world=(self.width, self.height),
+                time=self.time,
+                step_count=self.step_count,
+                substeps=self.substeps,
+                grid_size=self.grid.grid_size,
+                spawn=self.spawn,
+                spawn_delay=self.spawn_delay,
+                spawn_elapsed=self.spawn_elapsed,
+                displacement=self.displacement,
+                overlap=self.overlap,
+                substep_window=list(self.scheduler.window) if self.scheduler is not None else [],
+            )
+
+    def load_checkpoint(self, path):
+        with np.load(path) as data:
+            if tuple(data["world"].tolist()) != (self.width, self.height):
+                raise ValueError(f"checkpoint is for a {data['world'][0]}x{data['world'][1]} world, not {self.width}x{self.height}")
+            self.particles.load_state(data)
+            self.time = float(data["time"])
+            self.step_count = int(data["step_count"])
+            self.substeps = int(data["substeps"])
+            # The tuned cell size, engines with a fixed one keep theirs
+            if self.grid_tuner is not None and "grid_size" in data:
+                self.grid.resize(data["grid_size"].item())
+            self.spawn = bool(data["spawn"])
+            self.spawn_delay = float(data["spawn_delay"])
+            self.spawn_elapsed = float(data["spawn_elapsed"])
+            self.displacement = float(data["displacement"])
+            self.overlap = float(data["overlap"])
+            if hasattr(self.broad_phase, "load_state") and "broad_phase_current" in data:
+                self.broad_phase.load_state({name: data[f"broad_phase_{name}"] for name in self.broad_phase.state()})
+            if self.scheduler is not None and "substep_window" in data:
+                self.scheduler.window.clear()
+                self.scheduler.window.extend(data["substep_window"].tolist())
+            if self.sleep is not None:
+                self.sleep.resize(0)
+                if "asleep" in data:
+                    self.sleep.asleep = data["asleep"].copy()
+                    self.sleep.rest = data["rest"].copy()
+                    self.sleep.island = data["island"].copy()
+        if self.neighbor_list is not None:
+            self.neighbor_list.invalidate()
+        self.forces.clear()
+        self.accumulator = 0.0
+        self.last_pos = None
+
+    def update_spawner(self, dt):
+        if not self.spawn:
+            return
+        self.spawn_elapsed += dt
+        if self.spawn_elapsed >= self.spawn_delay:
+            self.spawn_particles()
+            self.spawn_elapsed -= self.spawn_delay
+
+    def tune_grid(self):
+        size = self.grid_tuner.choose(self.particles.pos, self.particles.radius, self.width, self.height, self.grid.grid_size)
+        if size != self.grid.grid_size:
+            self.grid.resize(size)
+            if self.neighbor_list is not None:
+                self.neighbor_list.invalidate()
+
+    def update_grid(self):
+        self.broad_phase.rebuild(self.particles.pos, self.particles.radius)
+
+    def find_candidates(self):
+        self.update_grid()
+        return self.broad_phase.candidate_pairs()
+
+    def solve_collisions(self):
+        if self.neighbor_list is None:
+            i, j = self.find_candidates()
+        else:
+            # The broad phase is only rebuilt when the neighbor list goes stale
+            reach = self.broad_phase.reach(self.particles.radius)
+            i, j = self.neighbor_list.pairs(self.particles.pos, self.particles.radius, reach, self.find_candidates)
+        if self.sleep is None:
+            self.narrow_phase.solve(self.particles.pos, self.particles.radius, i, j)
+            return
+        i, j, weight = self.sleep.pairs(self.particles.pos, self.particles.radius, i, j)
+        self.narrow_phase.solve(self.particles.pos, self.particles.radius, i, j, weight)
+
+    def update_particles(self, dt, force):
+        index = slice(None) if self.sleep is None else self.sleep.awake_index()
+        self.particles.accelerate(force, index)
+        self.particles.integrate(dt, index)
+
+    def set_substeps(self, substeps):
+        # Verlet velocities are displacements per substep, rescale them so
+        # particles keep their speed across the change
+        if substeps != self.substeps:
+            particles = self.particles
+            particles.prev_pos[:] = particles.pos - (particles.pos - particles.prev_pos) * (self.substeps / substeps)
+            self.substeps = substeps
+
+    def step(self, dt):
+        self.update_spawner(dt)
+        if self.grid_tuner is not None:
+            # Also right away when a particle is too large for the cells
+            if self.step_count % self.grid_tuner.interval == 0 or 2 * self.particles.radius.max(initial=0) > self.grid.grid_size:
+                self.tune_grid()
+        if self.scheduler is not None:
+            self.set_substeps(self.scheduler.choose(self.substeps, self.displacement, self.overlap))
+            start = self.particles.pos.copy()
+            overlap = 0.0
+        force = self.gravity + sum(self.forces)
+        self.forces.clear()
+        sub_dt = dt / self.substeps
+        if self.sleep is not None:
+            self.sleep.begin_step(self.particles.pos)
+        for _ in range(self.substeps):
+            self.solve_collisions()
+            self.update_particles(sub_dt, force)
+            if self.scheduler is not None:
+                overlap = max(overlap, self.narrow_phase.max_overlap)
+        if self.sleep is not None:
+            self.sleep.end_step(self.particles.pos, self.particles.prev_pos, self.particles.radius)
+        if self.scheduler is not None:
+            moved = self.particles.pos - start
+            self.displacement = np.sqrt((moved * moved).sum(axis=1).max(initial=0)) / self.substeps
+            self.overlap = overlap
+        self.time += dt
+        self.step_count += 1
+
+    def advance(self, frame_dt):
+        # Fixed-timestep driver for real-time front-ends. Runs the steps that
+        # the elapsed time covers, at most max_steps per frame; time beyond
+        # that is dropped and the simulation falls behind real time instead
+        # of taking ever larger steps.
+        self.accumulator += frame_dt
+        steps = 0
+        while self.accumulator >= self.fixed_dt and steps < self.max_steps:
+            self.last_pos = self.particles.pos.copy()
+            self.step(self.fixed_dt)
+            self.accumulator -= self.fixed_dt
+            steps += 1
+        self.behind = self.accumulator >= self.fixed_dt
+        if self.behind:
+            self.dropped_time += self.accumulator - self.accumulator % self.fixed_dt
+            self.accumulator %= self.fixed_dt
+        return steps
+
+    @property
+    def alpha(self):
+        # Fraction of a step accumulated but not simulated yet
+        return self.accumulator / self.fixed_dt
+
+    def render_positions(self):
+        # Positions between the last two steps, which keeps motion smooth
+        # when frames and steps do not line up
+        pos = self.particles.pos
+        if self.last_pos is None:
+            return pos
+        last = self.last_pos[:len(pos)]
+        count = len(last)
+        render = pos.copy()
+        render[:count] = last + (pos[:count] - last) * self.alpha
+        return render
+
+    def run(self, n_steps, dt):
+        # Returns the measured throughput in steps per second
+        start = time.perf_counter()
+        for _ in range(n_steps):
+            self.step(dt)
+        elapsed = time.perf_counter() - start
+        return n_steps / elapsed if elapsed > 0 else float("inf")
+
+
+if __name__ == "__main__":
+    engine = Engine(width, height)
+    engine.spawn = True
+    steps_per_second = engine.run(2000, 1 / 80)
+    print(f"Particles: {len(engine.particles)}, Steps/s: {steps_per_second:.1f}")
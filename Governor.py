@@ -0,0 +1,93 @@
+class Governor:
+    # Keeps the work per frame (physics plus rendering) within `budget`
+    # seconds. Over budget it sheds load in order: anti-aliasing, spawn rate,
+    # spawning altogether, substeps. Well under budget it restores them in
+    # reverse, so the scene keeps growing as long as the machine keeps up.
+    # Timings are smoothed and changes are at least `cooldown` frames apart
+    # so every change can take effect before the next one. Each change is
+    # recorded in `decisions` as (engine time, setting, value, load).
+    def __init__(self, engine, sprite_batch, budget=1 / 60, cooldown=30):
+        self.engine = engine
+        self.sprite_batch = sprite_batch
+        self.budget = budget
+        self.cooldown = cooldown
+        self.high = 1.0
+        self.low = 0.75
+        self.smoothing = 0.1
+        self.min_substeps = 1
+        self.max_substeps = self.substep_limit
+        self.min_spawn_delay = engine.spawn_delay
+        self.max_spawn_delay = 16 * engine.spawn_delay
+        self.physics_time = 0.0
+        self.render_time = 0.0
+        self.frames = 0
+        self.decisions = []
+
+    @property
+    def substep_limit(self):
+        # The scheduler's ceiling when substeps are adaptive, the count itself
+        # otherwise
+        if self.engine.scheduler is not None:
+            return self.engine.scheduler.max_substeps
+        return self.engine.substeps
+
+    @substep_limit.setter
+    def substep_limit(self, substeps):
+        if self.engine.scheduler is not None:
+            self.engine.scheduler.max_substeps = substeps
+        else:
+            self.engine.set_substeps(substeps)
+
+    @property
+    def load(self):
+        return (self.physics_time + self.render_time) / self.budget
+
+    def update(self, physics_time, render_time):
+        self.physics_time += (physics_time - self.physics_time) * self.smoothing
+        self.render_time += (render_time - self.render_time) * self.smoothing
+        self.frames += 1
+        if self.frames < self.cooldown:
+            return
+        if self.load > self.high:
+            self.shed()
+        elif self.load < self.low:
+            self.restore()
+
+    def decide(self, setting, value):
+        self.decisions.append((self.engine.time, setting, value, self.load))
+        self.frames = 0
+
+    def shed(self):
+        engine = self.engine
+        if self.sprite_batch.antialias:
+            self.sprite_batch.set_antialias(False)
+            self.decide("antialias", False)
+        elif engine.spawn and engine.spawn_delay < self.max_spawn_delay:
+            engine.spawn_delay *= 2
+            self.decide("spawn_delay", engine.spawn_delay)
+        elif engine.spawn:
+            engine.spawn = False
+            self.decide("spawn", False)
+        elif self.substep_limit > self.min_substeps:
+            self.substep_limit -= 1
+            self.decide("substeps", self.substep_limit)
+
+    def restore(self):
+        engine = self.engine
+        if self.substep_limit < self.max_substeps:
+            self.substep_limit += 1
+            self.decide("substeps", self.substep_limit)
+        elif not engine.spawn:
+            engine.spawn = True
+            self.decide("spawn", True)
+        elif engine.spawn_delay > self.min_spawn_delay:
+            engine.spawn_delay = max(engine.spawn_delay / 2, self.min_spawn_delay)
+            self.decide("spawn_delay", engine.spawn_delay)
+        elif not self.sprite_batch.antialias:
+            self.sprite_batch.set_antialias(True)
+            self.decide("antialias", True)
+
+    def summary(self):
+        engine = self.engine
+        spawn = f"{1 / engine.spawn_delay:.0f}/s" if engine.spawn else "off"
+        return f"Load: {self.load:.2f}, Substeps: {engine.substeps}, Spawn: {spawn}, AA: {'on' if self.sprite_batch.antialias else 'off'}"
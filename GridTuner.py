@@ -0,0 +1,82 @@
+import math
+import numpy as np
+from UniformGrid import grid_cost
+
+# Constants
+growth = 1.25
+sizes = 8
+histogram_bins = 8
+# Cost of filtering a candidate pair afterwards in the units of grid_cost,
+# measured on Engine with its neighbor list
+pair_weight = 23.5
+
+class GridTuner:
+    # Picks the UniformGrid cell size. The smallest valid size is the largest
+    # diameter plus the neighbor list skin, below that a 3x3 neighborhood
+    # misses pairs. Larger sizes, up to growth ** (sizes - 1) times that,
+    # trade fewer cells for more pairs per neighborhood: each is scored with
+    # grid_cost, plus the filtering of its candidate pairs, on the cell
+    # occupancy the current positions would give, and the cheapest wins.
+    # Checked every `interval` steps; the size changes when the radius rules
+    # out the current one or another size is estimated at least `gain`
+    # cheaper, so the grid follows the particles as they spread out or pile
+    # up without flapping.
+    def __init__(self, skin=0, interval=60, gain=0.1):
+        self.skin = skin
+        self.interval = interval
+        self.gain = gain
+        self.retunes = 0
+        self.reason = None
+        self.costs = {}
+        self.histogram = np.zeros(histogram_bins + 1, dtype=np.int64)
+
+    def min_size(self, radius):
+        return 2 * float(radius.max()) + self.skin
+
+    def occupancy(self, pos, width, height, size):
+        # Particles per cell at `size`, a (cols, rows) array
+        cols, rows = -(-width // size), -(-height // size)
+        cells = (pos // size).astype(np.int64)
+        np.clip(cells[:, 0], 0, cols - 1, out=cells[:, 0])
+        np.clip(cells[:, 1], 0, rows - 1, out=cells[:, 1])
+        return np.bincount(cells[:, 0] * rows + cells[:, 1], minlength=cols * rows).reshape(cols, rows)
+
+    def pairs(self, per_cell):
+        # Candidate pairs UniformGrid.candidate_pairs would return
+        padded = np.pad(per_cell, 1)
+        cols, rows = per_cell.shape
+        around = sum(padded[1 + dx:1 + dx + cols, 1 + dy:1 + dy + rows] for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+        return (int((per_cell * around).sum()) - int(per_cell.sum())) // 2
+
+    def cost(self, per_cell):
+        pairs = self.pairs(per_cell)
+        return grid_cost(per_cell.size, int(per_cell.sum()), pairs) + pair_weight * pairs
+
+    def choose(self, pos, radius, width, height, current):
+        # Returns the cell size to use, `current` if it should stay
+        if len(pos) == 0:
+            return current
+        smallest = math.ceil(self.min_size(radius))
+        options = sorted({math.ceil(smallest * growth ** k) for k in range(sizes)} | ({current} if current >= smallest else set()))
+        self.costs = {size: self.cost(self.occupancy(pos, width, height, size)) for size in options}
+        best = min(self.costs, key=self.costs.get)
+        if current < smallest:
+            self.reason = "radius"
+        elif self.costs[best] < (1 - self.gain) * self.costs[current]:
+            self.reason = "occupancy"
+        else:
+            best = current
+        self.histogram = np.bincount(np.minimum(self.occupancy(pos, width, height, best).ravel(), histogram_bins), minlength=histogram_bins + 1)
+        if best != current:
+            self.retunes += 1
+        return best
+
+    def stats(self):
+        # Estimated cost per candidate size, the reason for the last change
+        # and how many cells held 0, 1, ... histogram_bins or more particles
+        return {
+            "retunes": self.retunes,
+            "reason": self.reason,
+            "costs": {str(size): cost for size, cost in self.costs.items()},
+            "histogram": self.histogram.tolist(),
+        }
@@ -1,4 +1,8 @@
+import numpy as np
+
 class Helper:
+    palette = None
+
     @classmethod
     def get_color(cls, iteration, step=2):
         factor = (iteration * step) % (256 * 6)
@@ -7,6 +11,25 @@ class Helper:
         g = 0 if stage < 1 else factor % 256 if stage < 2 else 255 if stage < 4 else 255 - (factor % 256) if stage < 5 else 0
         b = 255 - (factor % 256) if stage < 1 else 0 if stage < 3 else factor % 256 if stage < 4 else 255
         return (r, g, b)
+
+    @classmethod
+    def get_palette(cls):
+        # The 1536 colors of get_color, built on first use
+        if cls.palette is None:
+            cls.palette = np.array([cls.get_color(i, step=1) for i in range(256 * 6)], dtype=np.uint8)
+        return cls.palette
+
+    @classmethod
+    def get_colors(cls, iterations, step=2):
+        # Vectorized get_color, returns an (n, 3) uint8 array
+        factor = np.floor(np.asarray(iterations, dtype=float) * step).astype(np.int64) % (256 * 6)
+        return cls.get_palette()[factor]
+
+    @classmethod
+    def get_speed_colors(cls, velocity):
+        # Colors of the particles as Particle.update used to assign them
+        velocity = np.asarray(velocity, dtype=float)
+        return cls.get_colors(255 + 85 - np.hypot(velocity[:, 0], velocity[:, 1]) * 40)
     
     @classmethod
     def create_grid(cls, width, height, grid_size):
@@ -0,0 +1,70 @@
+import math
+import numpy as np
+from UniformGrid import UniformGrid
+
+class HierarchicalGrid:
+    # One UniformGrid per power-of-two size class. Level k has cells of
+    # base_size * 2 ** k, where base_size fits the smallest particles, and
+    # holds the particles whose diameter plus `margin` fits its cells, so
+    # every particle sits in a grid sized for it rather than for the largest
+    # one. Pairs within a level come from that level's 3x3 neighborhoods; a
+    # particle meets the larger ones through the 3x3 neighborhood of its
+    # position in each coarser level, which covers them since the larger
+    # particle's cell is at least as wide as both radii plus the margin.
+    def __init__(self, width, height, margin=0.0):
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.base_size = None
+        self.grids = {}
+        self.levels = []
+        self.pos = np.zeros((0, 2))
+        self.candidates = 0
+
+    def rebuild(self, pos, radius):
+        reach = 2 * radius + self.margin
+        self.pos = pos
+        if len(pos) == 0:
+            self.levels = []
+            return
+        base_size = math.ceil(reach.min())
+        if base_size != self.base_size:
+            self.base_size = base_size
+            self.grids = {}
+        level = np.maximum(np.ceil(np.log2(reach / base_size)), 0).astype(np.int64)
+        self.levels = []
+        for k in np.unique(level).tolist():
+            if k not in self.grids:
+                self.grids[k] = UniformGrid(self.width, self.height, base_size * 2 ** k)
+            index = np.flatnonzero(level == k)
+            self.grids[k].rebuild(pos[index])
+            self.levels.append((self.grids[k], index))
+
+    def candidate_pairs(self):
+        # Unordered (i < j) pairs
+        pairs_i, pairs_j = [], []
+        smaller = np.zeros(0, dtype=np.int64)
+        for grid, index in self.levels:
+            i, j = grid.candidate_pairs()
+            pairs_i.append(index[i])
+            pairs_j.append(index[j])
+            if len(smaller):
+                i, j = grid.query(self.pos[smaller])
+                pairs_i.append(smaller[i])
+                pairs_j.append(index[j])
+            smaller = np.concatenate((smaller, index))
+        if not pairs_i:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        i, j = np.concatenate(pairs_i), np.concatenate(pairs_j)
+        self.candidates += len(i)
+        return np.minimum(i, j), np.maximum(i, j)
+
+    def query_box(self, low, high):
+        # Particles of the cells, at every level, within half a cell of the
+        # box, which includes every particle whose bounding box touches it
+        low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+        found = [index[grid.query_box(low - grid.grid_size / 2, high + grid.grid_size / 2)] for grid, index in self.levels]
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def stats(self):
+        return {"base_size": self.base_size, "levels": {grid.grid_size: len(index) for grid, index in self.levels}}
@@ -0,0 +1,60 @@
+import numpy as np
+
+class NeighborList:
+    # Verlet neighbor list. Candidate pairs within r_i + r_j + skin are kept
+    # and reused until some particle has moved more than skin / 2 since the
+    # list was built, which is the first moment a pair outside the list
+    # could start overlapping.
+    def __init__(self, skin=5):
+        self.skin = skin
+        self.i = np.zeros(0, dtype=np.int64)
+        self.j = np.zeros(0, dtype=np.int64)
+        self.reference = np.zeros((0, 2))
+        self.builds = 0
+        self.queries = 0
+
+    @property
+    def hits(self):
+        return self.queries - self.builds
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.queries if self.queries else 0.0
+
+    def invalidate(self):
+        self.reference = np.zeros((0, 2))
+
+    def effective_skin(self, radius, reach):
+        # The broad phase only sees pairs closer than `reach`, the cell size
+        # for a 3x3 grid neighborhood
+        largest = radius.max() if len(radius) else 0
+        return max(min(self.skin, reach - 2 * largest), 0)
+
+    def stale(self, pos, skin):
+        if len(pos) != len(self.reference):
+            return True
+        moved = pos - self.reference
+        limit = skin / 2
+        return bool(((moved * moved).sum(axis=1) > limit * limit).any())
+
+    def pairs(self, pos, radius, reach, find_candidates):
+        # find_candidates() returns the broad-phase pairs of the current state
+        self.queries += 1
+        skin = self.effective_skin(radius, reach)
+        if self.stale(pos, skin):
+            self.builds += 1
+            i, j = find_candidates()
+            delta = pos[i] - pos[j]
+            reach = radius[i] + radius[j] + skin
+            near = (delta * delta).sum(axis=1) <= reach * reach
+            self.i, self.j = i[near], j[near]
+            self.reference = pos.copy()
+        return self.i, self.j
+
+    def stats(self):
+        return {
+            "builds": self.builds,
+            "queries": self.queries,
+            "hit_rate": self.hit_rate,
+            "pairs": len(self.i),
+        }
@@ -1,5 +1,4 @@
 from pygame.math import Vector2
-from Helper import Helper
 
 class Particle:
     def __init__(self, pos, radius, color, width, height, mass=1):
@@ -9,6 +8,7 @@ class Particle:
         self.color = color
         self.mass = mass
         self.acceleration = Vector2(0, 0)
+        self.velocity = Vector2(0, 0)
         self.width = width
         self.height = height
 
@@ -24,7 +24,8 @@ class Particle:
     def update(self, dt):
         # Calculate velocity
         velocity = self.pos - self.prev_pos
-        self.color = Helper.get_color(255 + 85 - velocity.length() * 40)
+        # Kept for coloring, which happens when drawing
+        self.velocity = velocity
         # Store previous position
         self.prev_pos = self.pos
         # Perform Verlet integration
@@ -0,0 +1,160 @@
+import numpy as np
+from Helper import Helper
+
+# Per-particle arrays that make up the simulation state
+state_fields = ("pos", "prev_pos", "acceleration", "radius", "mass", "color")
+
+class ParticleArray:
+    # Structure-of-arrays particle store. Row i of every array is particle i,
+    # the public arrays are views over the first `count` rows of the buffers.
+    def __init__(self, width, height, capacity=1024):
+        self.width = width
+        self.height = height
+        self.count = 0
+        self.margin = 2
+        self._pos = np.zeros((capacity, 2))
+        self._prev_pos = np.zeros((capacity, 2))
+        self._acceleration = np.zeros((capacity, 2))
+        self._radius = np.zeros(capacity)
+        self._mass = np.ones(capacity)
+        self._color = np.zeros((capacity, 3), dtype=np.uint8)
+        self._velocity = np.zeros((capacity, 2))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def pos(self):
+        return self._pos[:self.count]
+
+    @property
+    def prev_pos(self):
+        return self._prev_pos[:self.count]
+
+    @property
+    def acceleration(self):
+        return self._acceleration[:self.count]
+
+    @property
+    def radius(self):
+        return self._radius[:self.count]
+
+    @property
+    def mass(self):
+        return self._mass[:self.count]
+
+    @property
+    def color(self):
+        return self._color[:self.count]
+
+    @property
+    def capacity(self):
+        return len(self._radius)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        for name in ("_pos", "_prev_pos", "_acceleration", "_radius", "_mass", "_color", "_velocity"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def state(self):
+        return {name: getattr(self, name) for name in state_fields}
+
+    def load_state(self, state):
+        # Bulk replacement of every particle, e.g. from a checkpoint
+        count = len(state["pos"])
+        self.count = 0
+        self.reserve(count)
+        self.count = count
+        for name in state_fields:
+            getattr(self, name)[:] = state[name]
+        self._velocity[:count] = self.pos - self.prev_pos
+
+    def add(self, pos, radius, color, mass=1):
+        self.reserve(self.count + 1)
+        i = self.count
+        self._pos[i] = pos
+        self._prev_pos[i] = pos
+        self._acceleration[i] = 0
+        self._radius[i] = radius
+        self._mass[i] = mass
+        self._color[i] = color
+        self.count += 1
+        return i
+
+    def add_many(self, pos, radius, color, mass=1):
+        # Batch version of add(), the other arguments broadcast against pos.
+        # Returns the slice of the new particles.
+        pos = np.asarray(pos, dtype=float).reshape(-1, 2)
+        start, end = self.count, self.count + len(pos)
+        self.reserve(end)
+        self._pos[start:end] = pos
+        self._prev_pos[start:end] = pos
+        self._acceleration[start:end] = 0
+        self._radius[start:end] = radius
+        self._mass[start:end] = mass
+        self._color[start:end] = color
+        self.count = end
+        return slice(start, end)
+
+    def add_particle(self, particle):
+        # Copy a Particle object into the store, keeping its current velocity
+        i = self.add(particle.pos, particle.radius, particle.color, particle.mass)
+        self._prev_pos[i] = particle.prev_pos
+        self._acceleration[i] = particle.acceleration
+        return i
+
+    def accelerate(self, force, index=slice(None)):
+        self.acceleration[index] += np.asarray(force, dtype=float) / self.mass[index, None]
+
+    def apply_gravity(self):
+        self.acceleration[:, 1] += 9.81
+
+    def add_velocity(self, velocity, index=slice(None)):
+        self.prev_pos[index] -= velocity
+
+    def integrate(self, dt, index=slice(None)):
+        # `index` restricts the step to some particles. Slices update the
+        # arrays in place through views, index arrays are gathered and
+        # written back afterwards.
+        if not isinstance(index, slice):
+            pos = self.pos[index]
+            prev_pos = self.prev_pos[index]
+            acceleration = self.acceleration[index]
+            velocity = self.verlet(dt, pos, prev_pos, acceleration, np.empty_like(pos))
+            self.pos[index] = pos
+            self.prev_pos[index] = prev_pos
+            self.acceleration[index] = 0
+            self._velocity[:self.count][index] = velocity
+        else:
+            self.verlet(dt, self.pos[index], self.prev_pos[index], self.acceleration[index], self._velocity[:self.count][index])
+        self.check_bounds(index)
+
+    def verlet(self, dt, pos, prev_pos, acceleration, velocity):
+        # Verlet step with the same velocity damping as Particle.update
+        np.subtract(pos, prev_pos, out=velocity)
+        prev_pos[:] = pos
+        acceleration -= velocity * 40
+        acceleration *= dt * dt
+        pos += velocity
+        pos += acceleration
+        acceleration[:] = 0
+        return velocity
+
+    def update_colors(self):
+        # Colors only matter when drawing, so they are computed here from the
+        # velocities of the last integration instead of on every substep
+        self.color[:] = Helper.get_speed_colors(self._velocity[:self.count])
+        return self.color
+
+    def check_bounds(self, index=slice(None)):
+        pos = self.pos[index]
+        low = self.radius[index] + self.margin
+        np.clip(pos[:, 0], low, self.width - low, out=pos[:, 0])
+        np.clip(pos[:, 1], low, self.height - low, out=pos[:, 1])
+        if not isinstance(index, slice):
+            self.pos[index] = pos
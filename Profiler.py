@@ -0,0 +1,112 @@
+import os
+import csv
+import json
+import time
+from collections import deque
+
+class Profiler:
+    # Per-frame phase timings and work counters. attach() shadows methods on
+    # an instance with timing wrappers and detach() removes them again, so
+    # nothing is measured, and nothing is paid, while it is detached. Times
+    # are exclusive: a phase called from inside another one, such as
+    # update_grid from solve_collisions, is not counted in both. Counters
+    # are running totals read once per frame and stored as differences.
+    # Frames are kept for a rolling window and optionally appended to a
+    # .csv or .jsonl log.
+    def __init__(self, window=120, log_path=None):
+        self.frames = deque(maxlen=window)
+        self.frame = 0
+        self.phases = []
+        self.counters = {}
+        self.wrapped = []
+        self.current = {}
+        self.stack = []
+        self.log_path = log_path
+        self.log = None
+        self.writer = None
+
+    @property
+    def attached(self):
+        return bool(self.wrapped)
+
+    def attach(self, obj, names):
+        for name in names:
+            if hasattr(obj, name):
+                setattr(obj, name, self.timed(name, getattr(obj, name)))
+                self.wrapped.append((obj, name))
+                if name not in self.phases:
+                    self.phases.append(name)
+
+    def detach(self):
+        for obj, name in self.wrapped:
+            delattr(obj, name)
+        # The stack is left alone, detach() may run inside a timed method
+        self.wrapped = []
+        self.current = {}
+
+    def count(self, name, read):
+        # `read()` returns a running total, e.g. lambda: narrow_phase.overlaps
+        self.counters[name] = [read, read()]
+
+    def timed(self, name, method):
+        def wrapper(*args, **kwargs):
+            self.stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                inner = self.stack.pop() if self.stack else 0.0
+                self.current[name] = self.current.get(name, 0.0) + elapsed - inner
+                if self.stack:
+                    self.stack[-1] += elapsed
+        return wrapper
+
+    def columns(self):
+        return ["frame"] + [f"{name}_ms" for name in self.phases] + list(self.counters)
+
+    def end_frame(self):
+        row = {"frame": self.frame}
+        for name in self.phases:
+            row[f"{name}_ms"] = self.current.get(name, 0.0) * 1000
+        for name, counter in self.counters.items():
+            total = counter[0]()
+            row[name] = total - counter[1]
+            counter[1] = total
+        self.current = {}
+        self.frame += 1
+        self.frames.append(row)
+        if self.log_path is not None:
+            self.write(row)
+        return row
+
+    def write(self, row):
+        if self.log is None:
+            self.log = open(self.log_path, "w", newline="")
+            if os.path.splitext(self.log_path)[1] == ".csv":
+                self.writer = csv.DictWriter(self.log, self.columns(), extrasaction="ignore", restval=0)
+                self.writer.writeheader()
+        if self.writer is not None:
+            self.writer.writerow(row)
+        else:
+            self.log.write(json.dumps(row) + "\n")
+
+    def averages(self):
+        if not self.frames:
+            return {}
+        return {key: sum(row.get(key, 0) for row in self.frames) / len(self.frames) for key in self.columns()[1:]}
+
+    def lines(self):
+        # Text for an on-screen overlay, averaged over the window
+        averages = self.averages()
+        lines = [f"{key[:-3]}: {value:.2f} ms" for key, value in averages.items() if key.endswith("_ms")]
+        lines.append(f"total: {sum(value for key, value in averages.items() if key.endswith('_ms')):.2f} ms")
+        lines += [f"{key}: {value:.0f}" for key, value in averages.items() if not key.endswith("_ms")]
+        return lines
+
+    def close(self):
+        self.detach()
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+            self.writer = None
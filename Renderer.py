@@ -0,0 +1,107 @@
+import time
+import argparse
+import pygame
+from Engine import Engine
+from SpriteBatch import SpriteBatch
+from Governor import Governor
+from Trajectory import TrajectoryRecorder
+from Profiler import Profiler
+
+# Constants
+width, height = 900, 900
+
+class Renderer:
+    # Optional pygame front-end for a headless Engine. With a recorder every
+    # drawn frame is also appended to its trajectory, see replay.py. F1
+    # toggles the profiler overlay; with a profile log the profiler runs
+    # from the start and every frame is logged.
+    def __init__(self, engine, recorder=None, profile_log=None):
+        pygame.init()
+        self.engine = engine
+        self.recorder = recorder
+        self.screen = pygame.display.set_mode((engine.width, engine.height))
+        self.sprite_batch = SpriteBatch()
+        self.governor = Governor(engine, self.sprite_batch)
+        self.clock = pygame.time.Clock()
+        self.running = True
+        self.profiler = Profiler(log_path=profile_log)
+        self.profiler.count("candidates", lambda: engine.broad_phase.candidates)
+        self.profiler.count("pair_tests", lambda: engine.narrow_phase.pair_tests)
+        self.profiler.count("overlaps", lambda: engine.narrow_phase.overlaps)
+        self.font = None
+        self.toggle = False
+        if profile_log is not None:
+            self.toggle_profiler()
+
+    def toggle_profiler(self):
+        if self.profiler.attached:
+            self.profiler.detach()
+            return
+        self.profiler.attach(self.engine, ("update_grid", "solve_collisions", "update_particles"))
+        self.profiler.attach(self, ("draw", "handle_events"))
+
+    def draw_profiler(self):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+        for k, line in enumerate(self.profiler.lines()):
+            self.screen.blit(self.font.render(line, True, (255, 255, 0)), (10, 10 + 16 * k))
+
+    def draw(self):
+        particles = self.engine.particles
+        self.sprite_batch.draw(self.screen, self.engine.render_positions(), particles.radius, particles.update_colors())
+
+    def handle_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.running = False
+                elif event.key == pygame.K_F1:
+                    # Applied once handle_events, itself profiled, has returned
+                    self.toggle = True
+            elif event.type == pygame.QUIT:
+                self.running = False
+        # Add force if space is pressed
+        keys = pygame.key.get_pressed()
+        if keys[pygame.K_SPACE]:
+            self.engine.apply_force((0, -2000))
+
+    def run(self):
+        engine = self.engine
+        engine.spawn = True
+        while self.running:
+            dt = self.clock.tick(80) / 1000  # Convert to seconds
+            self.fps = self.clock.get_fps()
+            pygame.display.set_caption(f"FPS: {self.fps:.2f}, Particles: {len(engine.particles)}, {self.governor.summary()}")
+
+            self.handle_events()
+            if self.toggle:
+                self.toggle = False
+                self.toggle_profiler()
+            start = time.perf_counter()
+            engine.advance(dt)
+            physics_time = time.perf_counter() - start
+
+            self.screen.fill((0, 0, 0))
+            self.draw()
+            if self.profiler.attached:
+                self.profiler.end_frame()
+                self.draw_profiler()
+            pygame.display.flip()
+            self.governor.update(physics_time, time.perf_counter() - start - physics_time)
+            if self.recorder is not None:
+                particles = engine.particles
+                self.recorder.record(engine.render_positions(), particles.radius, particles.color, engine.time)
+        if self.recorder is not None:
+            self.recorder.close()
+        self.profiler.close()
+        pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("record", nargs="?", help="directory to record the run into")
+    parser.add_argument("--profile", help="per-frame profile log, .csv or .jsonl")
+    parser.add_argument("--broad-phase", default="grid", choices=["grid", "hgrid", "kdtree", "sweep", "brute", "auto"])
+    args = parser.parse_args()
+    recorder = TrajectoryRecorder(args.record, width, height) if args.record else None
+    Renderer(Engine(width, height, broad_phase=args.broad_phase), recorder, args.profile).run()
@@ -0,0 +1,215 @@
+import os
+import queue
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+from Engine import Engine, grid_size
+from ParticleArray import ParticleArray
+from UniformGrid import UniformGrid
+from Collision import NarrowPhase
+
+particle_fields = ["_pos", "_prev_pos", "_acceleration", "_radius", "_mass", "_color", "_velocity"]
+
+class SharedBuffers:
+    # Named shared memory segments holding numpy arrays. Created by the main
+    # process and attached by name in the workers.
+    def __init__(self, specs, names=None):
+        self.specs = specs
+        self.segments = {}
+        self.arrays = {}
+        for key, (shape, dtype) in specs.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            if names is None:
+                segment = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                segment = shared_memory.SharedMemory(name=names[key])
+            self.segments[key] = segment
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+    @property
+    def names(self):
+        return {key: segment.name for key, segment in self.segments.items()}
+
+    def close(self):
+        self.arrays.clear()
+        for segment in self.segments.values():
+            segment.close()
+
+    def unlink(self):
+        for segment in self.segments.values():
+            segment.unlink()
+
+
+def buffer_specs(particles, grid):
+    specs = {name: (getattr(particles, name).shape, getattr(particles, name).dtype) for name in particle_fields}
+    specs["order"] = ((particles.capacity,), np.int64)
+    specs["_cells"] = ((particles.capacity, 2), np.int64)
+    specs["cell_start"] = (grid.cell_start.shape, grid.cell_start.dtype)
+    specs["cell_count"] = (grid.cell_count.shape, grid.cell_count.dtype)
+    return specs
+
+def bind(buffers, particles, grid):
+    for name in particle_fields:
+        setattr(particles, name, buffers.arrays[name])
+    grid._cells = buffers.arrays["_cells"]
+    grid.cell_start = buffers.arrays["cell_start"]
+    grid.cell_count = buffers.arrays["cell_count"]
+
+def worker_main(tasks, results, width, height, grid_size):
+    particles = ParticleArray(width, height, capacity=0)
+    grid = UniformGrid(width, height, grid_size)
+    narrow_phase = NarrowPhase()
+    buffers = None
+    parent = multiprocessing.parent_process()
+    while True:
+        try:
+            message = tasks.get(timeout=1)
+        except queue.Empty:
+            # Do not outlive a main process that was killed
+            if parent is not None and not parent.is_alive():
+                break
+            continue
+        kind = message[0]
+        if kind == "stop":
+            break
+        if kind == "attach":
+            _, specs, names = message
+            old, buffers = buffers, SharedBuffers(specs, names)
+            bind(buffers, particles, grid)
+            if old is not None:
+                old.close()
+            results.put(None)
+        elif kind == "integrate":
+            _, count, start, end, dt, force = message
+            particles.count = count
+            index = slice(start, end)
+            particles.accelerate(force, index)
+            particles.integrate(dt, index)
+            results.put(None)
+        elif kind == "collide":
+            _, count, start, end = message
+            particles.count = count
+            grid.order = buffers.arrays["order"][:count]
+            tests, overlaps = narrow_phase.pair_tests, narrow_phase.overlaps
+            i, j = grid.candidate_pairs(np.arange(start, end))
+            narrow_phase.solve(particles.pos, particles.radius, i, j)
+            results.put((narrow_phase.pair_tests - tests, narrow_phase.overlaps - overlaps, narrow_phase.max_overlap))
+    if buffers is not None:
+        buffers.close()
+
+
+class SharedEngine(Engine):
+    # Multi-core Engine. Particle and grid arrays live in shared memory and a
+    # pool of long-lived worker processes is signalled once per phase.
+    # Collisions use the odd/even strip scheme of grid-threaded: strips are at
+    # least two columns wide, so strips solved in the same pass never touch
+    # the same particles.
+    def __init__(self, width, height, grid_size=grid_size, substeps=3, workers=None):
+        # Workers build their strip's pairs from the grid and integrate whole
+        # ranges, so neither neighbor lists nor sleeping apply. The cell size
+        # stays fixed, the workers' grids and shared buffers are sized for it.
+        super().__init__(width, height, grid_size, substeps, skin=0, sleep=False, tune_grid=False)
+        self.worker_count = workers or os.cpu_count()
+        self.buffers = None
+        # Workers must share our resource tracker, otherwise each one starts
+        # its own and unlinks the segments it attached when it exits
+        resource_tracker.ensure_running()
+        self.results = multiprocessing.Queue()
+        self.tasks = []
+        self.processes = []
+        for _ in range(self.worker_count):
+            tasks = multiprocessing.Queue()
+            process = multiprocessing.Process(target=worker_main, args=(tasks, self.results, width, height, grid_size), daemon=True)
+            process.start()
+            self.tasks.append(tasks)
+            self.processes.append(process)
+        self.strips = self.build_strips()
+
+    def build_strips(self):
+        # Column ranges for the even and odd passes, two columns minimum each
+        cols = self.grid.cols
+        strip_count = max(min(2 * self.worker_count, cols // 2), 1)
+        edges = np.linspace(0, cols, strip_count + 1).astype(int)
+        strips = [(start * self.grid.rows, end * self.grid.rows) for start, end in zip(edges[:-1].tolist(), edges[1:].tolist())]
+        return strips[0::2], strips[1::2]
+
+    def share_buffers(self):
+        # (Re)create the shared segments whenever the store has grown
+        if self.buffers is not None and self.particles._pos is self.buffers.arrays["_pos"]:
+            return
+        specs = buffer_specs(self.particles, self.grid)
+        buffers = SharedBuffers(specs)
+        for name in particle_fields:
+            buffers.arrays[name][:] = getattr(self.particles, name)
+        buffers.arrays["cell_start"][:] = self.grid.cell_start
+        buffers.arrays["cell_count"][:] = self.grid.cell_count
+        bind(buffers, self.particles, self.grid)
+        self.dispatch([("attach", specs, buffers.names)] * self.worker_count)
+        if self.buffers is not None:
+            self.buffers.close()
+            self.buffers.unlink()
+        self.buffers = buffers
+
+    def dispatch(self, messages):
+        for tasks, message in zip(self.tasks, messages):
+            tasks.put(message)
+        replies = []
+        while len(replies) < len(messages):
+            try:
+                replies.append(self.results.get(timeout=1))
+            except queue.Empty:
+                if not all(process.is_alive() for process in self.processes):
+                    raise RuntimeError("SharedEngine worker process exited")
+        return replies
+
+    def update_grid(self):
+        # The cell size is fixed, see __init__, and the strips' 3x3
+        # searches would miss pairs of particles wider than a cell
+        if 2 * self.particles.radius.max(initial=0) > self.grid.grid_size:
+            raise ValueError(f"grid cells of {self.grid.grid_size} are smaller than the largest particle, {2 * self.particles.radius.max():g} across")
+        self.share_buffers()
+        count = len(self.particles)
+        self.grid.rebuild(self.particles.pos)
+        self.buffers.arrays["order"][:count] = self.grid.order
+
+    def solve_collisions(self):
+        self.update_grid()
+        count = len(self.particles)
+        self.narrow_phase.max_overlap = 0.0
+        for strips in self.strips:
+            messages = [("collide", count, start, end) for start, end in strips]
+            for tests, overlaps, max_overlap in self.dispatch(messages):
+                self.narrow_phase.pair_tests += tests
+                self.narrow_phase.overlaps += overlaps
+                self.narrow_phase.max_overlap = max(self.narrow_phase.max_overlap, max_overlap)
+
+    def update_particles(self, dt, force):
+        count = len(self.particles)
+        edges = np.linspace(0, count, self.worker_count + 1).astype(int)
+        messages = [("integrate", count, start, end, dt, force) for start, end in zip(edges[:-1], edges[1:])]
+        self.dispatch(messages)
+
+    def close(self):
+        for tasks in self.tasks:
+            tasks.put(("stop",))
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        if self.buffers is not None:
+            # Hand the store back private copies before releasing the segments
+            for name in particle_fields:
+                setattr(self.particles, name, self.buffers.arrays[name].copy())
+            self.grid._cells = self.grid._cells.copy()
+            self.grid.cell_start = self.grid.cell_start.copy()
+            self.grid.cell_count = self.grid.cell_count.copy()
+            self.buffers.close()
+            self.buffers.unlink()
+            self.buffers = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
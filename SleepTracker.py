@@ -0,0 +1,115 @@
+import numpy as np
+
+class SleepTracker:
+    # Puts resting islands to sleep. An island is a group of particles
+    # connected through contacts, and it falls asleep once the motion of
+    # every member over a whole step, velocity plus collision corrections,
+    # has stayed below `threshold` for `steps` consecutive steps
+    # (pos - prev_pos is not used as the speed, the wall clamp makes it
+    # flicker for particles resting on the floor). Sleepers are not
+    # integrated and hold still against awake particles. An awake particle
+    # overlapping a sleeper by more than `wake_threshold` wakes its whole
+    # island, as does any external force.
+    def __init__(self, threshold=0.2, steps=30, wake_threshold=0.5):
+        self.threshold = threshold
+        self.steps = steps
+        self.wake_threshold = wake_threshold
+        self.asleep = np.zeros(0, dtype=bool)
+        self.rest = np.zeros(0, dtype=np.int64)
+        self.island = np.zeros(0, dtype=np.int64)
+        self.start = np.zeros((0, 2))
+        self.i = np.zeros(0, dtype=np.int64)
+        self.j = np.zeros(0, dtype=np.int64)
+        self.wakes = 0
+
+    @property
+    def sleeping(self):
+        return int(np.count_nonzero(self.asleep))
+
+    def resize(self, count):
+        # New particles start awake, as their own island
+        grow = max(count - len(self.asleep), 0)
+        self.asleep = np.concatenate((self.asleep[:count], np.zeros(grow, dtype=bool)))
+        self.rest = np.concatenate((self.rest[:count], np.zeros(grow, dtype=np.int64)))
+        self.island = np.concatenate((self.island[:count], np.arange(count - grow, count)))
+
+    def wake(self, index=slice(None)):
+        self.wakes += int(np.count_nonzero(self.asleep[index]))
+        self.asleep[index] = False
+        self.rest[index] = 0
+
+    def wake_islands(self, index):
+        if len(index) == 0:
+            return
+        hit = np.zeros(len(self.asleep), dtype=bool)
+        hit[self.island[index]] = True
+        self.wake(hit[self.island] & self.asleep)
+
+    def awake_index(self):
+        # A slice while nobody sleeps, so the integrator keeps working on views
+        if not self.asleep.any():
+            return slice(None)
+        return np.flatnonzero(~self.asleep)
+
+    def begin_step(self, pos):
+        self.resize(len(pos))
+        self.start = pos.copy()
+
+    def pairs(self, pos, radius, i, j):
+        # Drops pairs of two sleepers and wakes the islands that awake
+        # particles have run into. Also returns the weights for
+        # NarrowPhase.solve, zero for sleepers so they hold still.
+        self.i, self.j = i, j
+        if not self.asleep.any():
+            return i, j, None
+        mixed = self.asleep[i] != self.asleep[j]
+        a, b = i[mixed], j[mixed]
+        delta = pos[a] - pos[b]
+        reach = np.maximum(radius[a] + radius[b] - self.wake_threshold, 0)
+        hit = (delta * delta).sum(axis=1) < reach * reach
+        self.wake_islands(np.where(self.asleep[a[hit]], a[hit], b[hit]))
+
+        keep = ~(self.asleep[i] & self.asleep[j])
+        return i[keep], j[keep], (~self.asleep).astype(float)
+
+    def label_islands(self, pos, radius):
+        # Connected components of the contact graph by label propagation
+        # with pointer jumping, each island is labelled by its lowest index
+        delta = pos[self.i] - pos[self.j]
+        reach = radius[self.i] + radius[self.j] + self.threshold
+        touching = (delta * delta).sum(axis=1) < reach * reach
+        i, j = self.i[touching], self.j[touching]
+        label = np.arange(len(pos))
+        while True:
+            low = np.minimum(label[i], label[j])
+            new = label.copy()
+            np.minimum.at(new, i, low)
+            np.minimum.at(new, j, low)
+            new = new[new]
+            if np.array_equal(new, label):
+                return label
+            label = new
+
+    def end_step(self, pos, prev_pos, radius):
+        moved = pos - self.start
+        calm = (moved * moved).sum(axis=1) < self.threshold * self.threshold
+        self.rest = np.where(calm, self.rest + 1, 0)
+        ready = ~self.asleep & (self.rest >= self.steps)
+        if not ready.any():
+            return
+        island = self.label_islands(pos, radius)
+        # An island is ready once its least rested member is
+        least = np.full(len(pos), np.iinfo(np.int64).max)
+        np.minimum.at(least, island, self.rest)
+        falling = ~self.asleep & (least[island] >= self.steps)
+        self.island[falling] = island[falling]
+        self.asleep |= falling
+        # Sleepers wake up at rest
+        prev_pos[falling] = pos[falling]
+
+    def stats(self):
+        return {
+            "asleep": self.sleeping,
+            "particles": len(self.asleep),
+            "wakes": self.wakes,
+        }
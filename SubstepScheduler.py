@@ -0,0 +1,50 @@
+import math
+from collections import deque
+
+class SubstepScheduler:
+    # Picks the substep count of each step from the previous one: the
+    # largest displacement per substep and the largest overlap the narrow
+    # phase saw. Displacement per substep shrinks with 1 / substeps and
+    # overlap from gravity compression with 1 / substeps^2, so both are
+    # projected to a new count and compared with their tolerances. Counts
+    # go up at once and down one at a time, and only after `calm_steps`
+    # steps in a row whose largest projection for one less still leaves
+    # some headroom; a settling pile would otherwise step down as soon as
+    # it is calm, compress, and jump back up in a cycle.
+    def __init__(self, min_substeps=1, max_substeps=6, max_displacement=6.0, max_overlap=10.0, calm_steps=60):
+        self.calm_steps = calm_steps
+        self.min_substeps = min_substeps
+        self.max_substeps = max_substeps
+        self.max_displacement = max_displacement
+        self.max_overlap = max_overlap
+        self.headroom = 0.8
+        self.counts = {}
+        self.window = deque(maxlen=calm_steps)
+
+    def ratio(self, displacement, overlap):
+        # Factor the substep count would need to grow by to meet both limits
+        return max(displacement / self.max_displacement, math.sqrt(overlap / self.max_overlap))
+
+    def choose(self, substeps, displacement, overlap):
+        ratio = self.ratio(displacement, overlap)
+        needed = math.ceil(substeps * ratio)
+        # The last calm_steps ratios seen since the count last changed
+        self.window.append(ratio)
+        if needed > substeps:
+            chosen = needed
+        elif substeps > 1 and len(self.window) == self.calm_steps and max(self.window) * substeps / (substeps - 1) < self.headroom:
+            chosen = substeps - 1
+        else:
+            chosen = substeps
+        chosen = max(self.min_substeps, min(chosen, self.max_substeps))
+        if chosen != substeps:
+            self.window.clear()
+        self.counts[chosen] = self.counts.get(chosen, 0) + 1
+        return chosen
+
+    def stats(self):
+        steps = sum(self.counts.values())
+        return {
+            "counts": dict(sorted(self.counts.items())),
+            "mean": sum(n * c for n, c in self.counts.items()) / steps if steps else 0.0,
+        }
@@ -0,0 +1,42 @@
+import numpy as np
+
+class SweepAndPrune:
+    # 1-D sweep-and-prune broad-phase. Particles are kept sorted by the lower
+    # end of their interval along `axis` across steps. Under temporal
+    # coherence the order is almost sorted already, so the repair is an
+    # adaptive stable sort (timsort) that runs in near linear time, like an
+    # insertion-sort pass but without a Python loop.
+    def __init__(self, axis=0):
+        self.axis = axis
+        self.order = np.zeros(0, dtype=np.int64)
+        self.swaps = 0
+        self.candidates = 0
+
+    def update(self, pos, radius):
+        count = len(pos)
+        if len(self.order) != count:
+            # Particles were added or removed, keep the known order first
+            known = self.order[self.order < count]
+            self.order = np.concatenate((known, np.arange(len(known), count)))
+        lower = pos[self.order, self.axis] - radius[self.order]
+        repair = np.argsort(lower, kind="stable")
+        self.swaps = int(np.count_nonzero(repair != np.arange(count)))
+        self.order = self.order[repair]
+        return lower[repair]
+
+    def pairs(self, pos, radius):
+        # Pairs (i, j) whose intervals overlap on both axes
+        lower = self.update(pos, radius)
+        order = self.order
+        upper = pos[order, self.axis] + radius[order]
+        end = np.searchsorted(lower, upper, side="right")
+        start = np.arange(1, len(order) + 1)
+        counts = np.maximum(end - start, 0)
+        first = np.repeat(np.arange(len(order)), counts)
+        second = np.repeat(start - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        i, j = order[first], order[second]
+        self.candidates = len(i)
+
+        other = 1 - self.axis
+        overlap = np.abs(pos[i, other] - pos[j, other]) <= radius[i] + radius[j]
+        return i[overlap], j[overlap]
@@ -0,0 +1,84 @@
+import os
+import json
+import numpy as np
+
+# One record per particle per frame, and one index entry per frame
+record_dtype = np.dtype([("pos", "<f4", 2), ("radius", "<f4"), ("color", "u1", 3)])
+index_dtype = np.dtype([("start", "<i8"), ("count", "<i8"), ("time", "<f8")])
+
+class TrajectoryRecorder:
+    # Appends frames to a trajectory directory: particles.bin holds the
+    # records of all frames back to back, index.bin where each frame starts.
+    # Both files are only ever appended to, so a reader can map them while
+    # the recording is still running.
+    def __init__(self, path, width, height):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "meta.json"), "w") as file:
+            json.dump({"width": width, "height": height, "record": record_dtype.descr, "index": index_dtype.descr}, file)
+        self.records = open(os.path.join(path, "particles.bin"), "wb")
+        self.index = open(os.path.join(path, "index.bin"), "wb")
+        self.start = 0
+        self.frames = 0
+
+    def record(self, pos, radius, color, time=0.0):
+        count = len(pos)
+        frame = np.empty(count, dtype=record_dtype)
+        frame["pos"] = pos
+        frame["radius"] = radius
+        frame["color"] = color
+        self.records.write(frame.tobytes())
+        self.index.write(np.array([(self.start, count, time)], dtype=index_dtype).tobytes())
+        self.start += count
+        self.frames += 1
+
+    def flush(self):
+        self.records.flush()
+        self.index.flush()
+
+    def close(self):
+        self.records.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    # Memory-mapped view of a recorded trajectory. Frames are slices of the
+    # record map, so any frame is reached in O(1) and nothing is copied
+    # until it is drawn.
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as file:
+            meta = json.load(file)
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.refresh()
+
+    def refresh(self):
+        # Maps the frames recorded so far
+        self.index = self.map("index.bin", index_dtype)
+        self.records = self.map("particles.bin", record_dtype)
+
+    def map(self, name, dtype):
+        filename = os.path.join(self.path, name)
+        count = os.path.getsize(filename) // dtype.itemsize
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(filename, dtype=dtype, mode="r", shape=(count,))
+
+    def __len__(self):
+        # Frames whose records are complete
+        complete = self.index["start"] + self.index["count"] <= len(self.records)
+        return int(np.count_nonzero(complete))
+
+    def frame(self, i):
+        start, count = int(self.index[i]["start"]), int(self.index[i]["count"])
+        return self.records[start:start + count]
+
+    def time(self, i):
+        return float(self.index[i]["time"])
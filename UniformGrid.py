@@ -0,0 +1,160 @@
+import numpy as np
+
+# Constants
+# Most particles in one cell for which rebuild() scatters them, it takes a
+# pass per particle the fullest cell holds. Fuller grids are sorted instead.
+scatter_limit = 4
+
+def grid_cost(cells, count, pairs):
+    # Estimated cost of a rebuild plus candidate_pairs in units of one empty
+    # cell, measured on this engine: every cell, every particle and every
+    # candidate pair of the 3x3 neighborhoods
+    return cells + 40 * count + 1.5 * pairs
+
+class UniformGrid:
+    # Dense grid built by counting sort. Cells are numbered column by column
+    # (cell_x * rows + cell_y), so the three cells of a neighborhood column are
+    # contiguous in `order` and a 3x3 lookup is three slices. The world does
+    # not have to be a multiple of the cell size, the last row and column
+    # reach past it.
+    def __init__(self, width, height, grid_size):
+        self.width = width
+        self.height = height
+        self.cell_ids = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)
+        self._order = np.zeros(0, dtype=np.int64)
+        self._index = np.zeros(0, dtype=np.int64)
+        self._cells = np.zeros((0, 2), dtype=np.int64)
+        self.candidates = 0
+        self.resize(grid_size)
+
+    def resize(self, grid_size):
+        # Takes effect on the next rebuild
+        self.grid_size = grid_size
+        self.cols = -(-self.width // grid_size)
+        self.rows = -(-self.height // grid_size)
+        cell_total = self.cols * self.rows
+        # Small grids fit in uint16, which numpy sorts with a linear radix
+        # sort when rebuild() falls back to sorting
+        self.id_dtype = np.uint16 if cell_total <= np.iinfo(np.uint16).max else np.int64
+        self.cell_start = np.zeros(cell_total + 1, dtype=np.int64)
+        self.cell_count = np.zeros(cell_total, dtype=np.int64)
+        self._end = np.zeros(cell_total, dtype=np.int64)
+        self._last = np.zeros(cell_total, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)
+
+    def cell_id(self, cell_x, cell_y):
+        return cell_x * self.rows + cell_y
+
+    def rebuild(self, pos):
+        count = len(pos)
+        if len(self._cells) < count:
+            self._cells = np.zeros((max(count, 2 * len(self._cells)), 2), dtype=np.int64)
+        if len(self._order) < count:
+            self._order = np.zeros(len(self._cells), dtype=np.int64)
+            self._index = np.arange(len(self._cells))
+        cells = self._cells[:count]
+        np.floor_divide(pos, self.grid_size, out=cells, casting="unsafe")
+        np.clip(cells[:, 0], 0, self.cols - 1, out=cells[:, 0])
+        np.clip(cells[:, 1], 0, self.rows - 1, out=cells[:, 1])
+
+        cell_ids = cells[:, 0] * self.rows
+        cell_ids += cells[:, 1]
+        self.cell_ids = cell_ids
+
+        # Counting sort: histogram, prefix sum, then every particle is
+        # scattered to a free slot of its cell in `order`
+        self.cell_count[:] = np.bincount(cell_ids, minlength=len(self.cell_count))
+        np.cumsum(self.cell_count, out=self.cell_start[1:])
+        self.order = self._order[:count]
+        if self.cell_count.max(initial=0) > scatter_limit:
+            self.order[:] = np.argsort(cell_ids.astype(self.id_dtype), kind="stable")
+        else:
+            self.scatter(cell_ids)
+
+    def scatter(self, cell_ids):
+        # Fills every cell from its end. Of repeated indices numpy assigns
+        # the last value, so each pass finds the highest-indexed particle
+        # left in every cell and puts it in that cell's last free slot,
+        # which keeps each cell in index order
+        index = self._index[:len(cell_ids)]
+        end = self._end
+        end[:] = self.cell_start[1:]
+        while len(index):
+            self._last[cell_ids] = index
+            placed = self._last[cell_ids] == index
+            cells = cell_ids[placed]
+            end[cells] -= 1
+            self.order[end[cells]] = index[placed]
+            left = ~placed
+            index, cell_ids = index[left], cell_ids[left]
+
+    def cell(self, cell_x, cell_y):
+        cell = self.cell_id(cell_x, cell_y)
+        return self.order[self.cell_start[cell]:self.cell_start[cell + 1]]
+
+    def column_slices(self, cell_x, cell_y):
+        # One contiguous slice of `order` per neighboring column
+        y0 = max(cell_y - 1, 0)
+        y1 = min(cell_y + 1, self.rows - 1)
+        slices = []
+        for x in range(max(cell_x - 1, 0), min(cell_x + 2, self.cols)):
+            start = self.cell_start[x * self.rows + y0]
+            end = self.cell_start[x * self.rows + y1 + 1]
+            slices.append(self.order[start:end])
+        return slices
+
+    def neighbors(self, cell_x, cell_y):
+        return np.concatenate(self.column_slices(cell_x, cell_y))
+
+    def _ragged(self, starts, counts):
+        # Concatenation of order[start:start + count] for every (start, count)
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        offsets += np.arange(len(offsets))
+        return self.order[offsets]
+
+    def particles_in(self, cells):
+        return self._ragged(self.cell_start[cells], self.cell_count[cells])
+
+    def around(self, cell_x, cell_y, values):
+        # (value, particle) for every particle in the 3x3 neighborhood of
+        # each (cell_x, cell_y), `values` says what to pair the particles with
+        y0 = np.maximum(cell_y - 1, 0)
+        y1 = np.minimum(cell_y + 1, self.rows - 1)
+        pairs_i, pairs_j = [], []
+        for dx in (-1, 0, 1):
+            x = cell_x + dx
+            valid = (x >= 0) & (x < self.cols)
+            x = x[valid] * self.rows
+            starts = self.cell_start[x + y0[valid]]
+            counts = self.cell_start[x + y1[valid] + 1] - starts
+            pairs_i.append(np.repeat(values[valid], counts))
+            pairs_j.append(self._ragged(starts, counts))
+        return pairs_i, pairs_j
+
+    def candidate_pairs(self, cells=None):
+        # Unordered (i < j) pairs for the 3x3 neighborhoods of a set of cells,
+        # or of the whole grid. A pair is reported by the lower index's cell.
+        first = self.order if cells is None else self.particles_in(np.asarray(cells))
+        pairs_i, pairs_j = self.around(self._cells[first, 0], self._cells[first, 1], first)
+        keep = [i < j for i, j in zip(pairs_i, pairs_j)]
+        pairs_i = np.concatenate([i[k] for i, k in zip(pairs_i, keep)])
+        pairs_j = np.concatenate([j[k] for j, k in zip(pairs_j, keep)])
+        self.candidates += len(pairs_i)
+        return pairs_i, pairs_j
+
+    def query(self, points):
+        # (point, particle) pairs for the 3x3 neighborhood of each point's cell
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        cell_x = np.clip(points[:, 0] // self.grid_size, 0, self.cols - 1).astype(np.int64)
+        cell_y = np.clip(points[:, 1] // self.grid_size, 0, self.rows - 1).astype(np.int64)
+        pairs_i, pairs_j = self.around(cell_x, cell_y, np.arange(len(points)))
+        return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+    def query_box(self, low, high):
+        # Particles of the cells overlapping the box [low, high]
+        x0, y0 = np.clip(np.asarray(low, dtype=float) // self.grid_size, 0, (self.cols - 1, self.rows - 1)).astype(int).tolist()
+        x1, y1 = np.clip(np.asarray(high, dtype=float) // self.grid_size, 0, (self.cols - 1, self.rows - 1)).astype(int).tolist()
+        # A column's cells are contiguous in `order`
+        columns = [self.order[self.cell_start[self.cell_id(x, y0)]:self.cell_start[self.cell_id(x, y1) + 1]] for x in range(x0, x1 + 1)]
+        return np.concatenate(columns) if columns else np.zeros(0, dtype=np.int64)
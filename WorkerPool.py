@@ -0,0 +1,80 @@
+import time
+import threading
+
+class WorkerPool:
+    # Persistent worker threads synchronized with a barrier. Each phase hands
+    # one argument tuple per worker to a target and returns once every worker
+    # has finished, so no thread is created or joined per phase.
+    def __init__(self, threads):
+        self.thread_count = threads
+        self.barrier = threading.Barrier(threads + 1)
+        self.target = None
+        self.args = []
+        self.busy = [0.0] * threads
+        self.errors = []
+        self.running = True
+        self.phase_time = {}
+        self.idle_time = {}
+        self.phase_calls = {}
+        self.threads = []
+        for i in range(threads):
+            thread = threading.Thread(target=self.worker, args=(i,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def worker(self, index):
+        while True:
+            self.barrier.wait()
+            if not self.running:
+                return
+            start = time.perf_counter()
+            try:
+                if index < len(self.args):
+                    self.target(*self.args[index])
+            except Exception as error:
+                self.errors.append(error)
+            self.busy[index] = time.perf_counter() - start
+            self.barrier.wait()
+
+    def run(self, name, target, args):
+        # `args` holds one tuple per worker, extra workers stay idle
+        if len(args) > self.thread_count:
+            raise ValueError(f"{len(args)} work ranges for {self.thread_count} workers")
+        self.target = target
+        self.args = args
+        self.busy = [0.0] * self.thread_count
+        start = time.perf_counter()
+        self.barrier.wait()
+        self.barrier.wait()
+        wall = time.perf_counter() - start
+
+        self.phase_time[name] = self.phase_time.get(name, 0) + wall
+        self.idle_time[name] = self.idle_time.get(name, 0) + wall * self.thread_count - sum(self.busy)
+        self.phase_calls[name] = self.phase_calls.get(name, 0) + 1
+        if self.errors:
+            error = self.errors[0]
+            self.errors = []
+            raise error
+
+    def stats(self):
+        return {
+            name: {
+                "calls": self.phase_calls[name],
+                "wall_ms": self.phase_time[name] * 1000,
+                "idle_ms": self.idle_time[name] * 1000,
+            }
+            for name in self.phase_time
+        }
+
+    def reset_stats(self):
+        self.phase_time.clear()
+        self.idle_time.clear()
+        self.phase_calls.clear()
+
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.barrier.wait()
+        for thread in self.threads:
+            thread.join()
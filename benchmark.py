@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import importlib.util
+import numpy as np
+import scenes
+from Profiler import Profiler
+from UniformGrid import UniformGrid
+
+# Legacy engines open a pygame window in Simulation.__init__
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+# Constants
+radius = 10
+dt = 1 / 80
+counts = [500, 1000, 5000, 10000, 50000, 100000]
+phases = ["update_grid", "update_interval_tree", "solve_collisions", "update_particles"]
+root = os.path.dirname(os.path.abspath(__file__))
+
+# name: (script, class, particle limit[, settings]). The limit keeps the
+# O(n^2) and object-per-particle engines out of sizes they cannot finish.
+# Settings are module globals for the legacy scripts and constructor
+# arguments for Engine.
+strategies = {
+    "engine": ("Engine.py", "Engine", 100000),
+    "engine-fixed-grid": ("Engine.py", "Engine", 100000, {"tune_grid": False}),
+    "engine-kdtree": ("Engine.py", "Engine", 100000, {"broad_phase": "kdtree"}),
+    "engine-hgrid": ("Engine.py", "Engine", 100000, {"broad_phase": "hgrid"}),
+    "engine-sweep": ("Engine.py", "Engine", 100000, {"broad_phase": "sweep"}),
+    "engine-auto": ("Engine.py", "Engine", 100000, {"broad_phase": "auto"}),
+    "default": ("default.py", "Simulation", 2000),
+    "default-array": ("default.py", "ArraySimulation", 1000),
+    "default-threaded": ("default-threaded.py", "Simulation", 2000),
+    "default-with-kdtree": ("default-with-kdtree.py", "Simulation", 10000, {"kdtree_mode": "object"}),
+    "default-with-kdtree-rebuild": ("default-with-kdtree.py", "Simulation", 10000, {"kdtree_mode": "rebuild"}),
+    "default-with-kdtree-refit": ("default-with-kdtree.py", "Simulation", 10000, {"kdtree_mode": "refit"}),
+    "default-interval-tree": ("default-interval-tree.py", "Simulation", 10000, {"use_sweep_and_prune": False}),
+    "sweep-and-prune": ("default-interval-tree.py", "Simulation", 10000, {"use_sweep_and_prune": True}),
+    "grid": ("grid.py", "Simulation", 10000),
+    "grid-array": ("grid.py", "ArraySimulation", 100000),
+    "grid-threaded": ("grid-threaded.py", "Simulation", 10000),
+    "grid-threaded-2": ("grid-threaded-2.py", "Simulation", 10000),
+    "grid-threaded-multi": ("SharedEngine.py", "SharedEngine", 100000),
+}
+# Strategies whose scripts do not simulate correctly. They are left out
+# unless asked for by name, and their results are flagged.
+broken = {
+    "default-threaded": "update() raises a TypeError",
+    "grid-threaded": "solve_collisions_thread is an empty stub, nothing collides",
+}
+
+# Strategies searching the 3x3 neighborhood of a cell size they cannot
+# change, which misses the pairs of particles wider than a cell
+fixed_grid = {"engine-fixed-grid", "grid", "grid-array", "grid-threaded", "grid-threaded-2", "grid-threaded-multi"}
+
+def world_size(side):
+    # Multiple of 960 so every grid and strip layout divides it evenly
+    return max(960, int(math.ceil(side / 960)) * 960)
+
+def dense_pile(count, rng):
+    # Touching, slightly jittered lattice resting on the floor
+    cols = int(math.ceil(math.sqrt(2 * count)))
+    size = world_size(cols * 2 * radius + 10)
+    index = np.arange(count)
+    x = radius + 5 + (index % cols) * 2 * radius
+    y = size - radius - 5 - (index // cols) * 2 * radius
+    pos = np.column_stack((x, y)) + rng.uniform(-0.5, 0.5, (count, 2))
+    return size, pos, np.zeros((count, 2))
+
+def falling_rain(count, rng):
+    # Sparse lattice in the upper half, falling at different speeds
+    cols = int(math.ceil(math.sqrt(2 * count)))
+    size = world_size(cols * 4 * radius + 10)
+    index = np.arange(count)
+    x = 2 * radius + (index % cols) * 4 * radius
+    y = 2 * radius + (index // cols) * 4 * radius
+    pos = np.column_stack((x, y)) + rng.uniform(-radius, radius, (count, 2))
+    velocity = np.column_stack((np.zeros(count), rng.uniform(2, 4, count)))
+    return size, pos, velocity
+
+def sparse_gas(count, rng):
+    # Uniform fill at 5% area fraction with random velocities
+    size = world_size(math.sqrt(count * math.pi * radius * radius / 0.05))
+    pos = rng.uniform(radius + 2, size - radius - 2, (count, 2))
+    velocity = rng.uniform(-2, 2, (count, 2))
+    return size, pos, velocity
+
+def dam_break(count, rng):
+    # Hexagonal block against the left wall, collapsing to the right
+    size = world_size(math.sqrt(count * 4 * radius * radius * 2))
+    return size, scenes.dam_break(size, size, radius, count, aspect=2), np.zeros((count, 2))
+
+def clear_of(points, others, distance, size):
+    # Mask of the points at least `distance` from every one of `others`.
+    # Cells of that size hold every point closer than it in the 3x3
+    # neighborhood, so only those pairs are measured.
+    grid = UniformGrid(size, size, math.ceil(distance))
+    grid.rebuild(others)
+    i, j = grid.query(points)
+    delta = points[i] - others[j]
+    close = i[(delta * delta).sum(axis=1) <= distance * distance]
+    free = np.ones(len(points), dtype=bool)
+    free[close] = False
+    return free
+
+def sand_and_boulders(count, rng):
+    # Grains of half the radius poured around 2% boulders of four times the
+    # radius, the boulders spread over the lower half, grains everywhere
+    grain, boulder = radius / 2, radius * 4
+    size = world_size(math.sqrt(count * (2 * grain) ** 2 * 2))
+    boulders = scenes.poisson_disk((0, size / 2, size, size), boulder, count // 50, gap=2 * grain, rng=rng)
+    wanted = count - len(boulders)
+    # Grains under the boulders are dropped, so more are thrown, scaled by
+    # the share that survived, until enough are left or the world is full
+    thrown = wanted
+    while True:
+        grains = scenes.poisson_disk((0, 0, size, size), grain, thrown, gap=0.5, rng=rng)
+        full = len(grains) < thrown
+        grains = grains[clear_of(grains, boulders, grain + boulder, size)]
+        if len(grains) >= wanted or full:
+            break
+        thrown = math.ceil(thrown * wanted / max(len(grains), 1) * 1.05)
+    # A random subset, keeping them spread over the whole world
+    keep = np.sort(rng.choice(len(grains), min(wanted, len(grains)), replace=False))
+    pos = np.concatenate((boulders, grains[keep]))
+    radii = np.concatenate((np.full(len(boulders), boulder), np.full(len(keep), grain)))
+    return size, pos, np.zeros_like(pos), radii
+
+scenarios = {
+    "pile": dense_pile,
+    "rain": falling_rain,
+    "gas": sparse_gas,
+    "dam": dam_break,
+    "sand": sand_and_boulders,
+}
+
+def checkpoint_scenario(path):
+    # Scenario replaying a saved Engine checkpoint, the particle count,
+    # radii and world, which need not be square, come from the file. Engine
+    # strategies load the whole checkpoint instead (see create_simulation),
+    # the legacy ones only get what they can represent.
+    with np.load(path) as data:
+        world = tuple(data["world"].tolist())
+        pos = data["pos"].copy()
+        velocity = pos - data["prev_pos"]
+        radii = data["radius"].copy()
+
+    def scenario(count, rng):
+        return world, pos, velocity, radii
+    return scenario, len(pos)
+
+def load_script(script):
+    name = os.path.splitext(script)[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, os.path.join(root, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def create_simulation(strategy, width, height, pos, velocity, radii, threads, checkpoint=None):
+    script, class_name = strategies[strategy][:2]
+    settings = (strategies[strategy][3:] or [{}])[0]
+    module = load_script(script)
+    if class_name == "Engine":
+        sim = module.Engine(width, height, **settings)
+    elif class_name == "SharedEngine":
+        sim = module.SharedEngine(width, height, workers=threads)
+    if class_name in ("Engine", "SharedEngine"):
+        # The checkpoint also restores masses, colors, substep and sleep state
+        if checkpoint is not None:
+            sim.load_checkpoint(checkpoint)
+        else:
+            sim.add_particles(pos, radii, (255, 255, 255), velocity=velocity)
+        return sim, sim.step
+
+    # Legacy scripts read the world size and settings from module globals
+    module.width, module.height = width, height
+    for name, value in settings.items():
+        setattr(module, name, value)
+
+    from pygame import Vector2
+    from Particle import Particle
+    sim = getattr(module, class_name)(width, height, threads)
+    for p, v, r in zip(pos.tolist(), velocity.tolist(), radii.tolist()):
+        particle = Particle(p, r, (255, 255, 255), width, height)
+        particle.add_velocity(Vector2(v))
+        sim.add_particle(particle)
+    return sim, sim.update
+
+def instrument(sim):
+    # Shadow the phase methods on the instance with exclusive timers, so
+    # update_grid called from solve_collisions is not counted in both
+    profiler = Profiler()
+    profiler.attach(sim, phases)
+    counter = {"pair_tests": 0}
+
+    def counted(method):
+        def wrapper(*args):
+            counter["pair_tests"] += 1
+            return method(*args)
+        return wrapper
+
+    if not hasattr(sim, "narrow_phase") and hasattr(sim, "resolve_collision"):
+        sim.resolve_collision = counted(sim.resolve_collision)
+
+    def pair_tests():
+        if hasattr(sim, "narrow_phase"):
+            return sim.narrow_phase.pair_tests
+        return counter["pair_tests"]
+    return profiler.current, pair_tests
+
+def run_case(strategy, scenario, count, steps, seed, threads, budget, checkpoint=None):
+    result = {"strategy": strategy, "scenario": scenario, "particles": count, "seed": seed, "threads": threads}
+    if strategy in broken:
+        result["broken"] = broken[strategy]
+    if count > strategies[strategy][2]:
+        result["skipped"] = "particle limit"
+        return result
+    # Scenarios may return per-particle radii as a fourth value, and a
+    # (width, height) world instead of the side of a square one
+    size, pos, velocity, *radii = scenarios[scenario](count, np.random.default_rng(seed))
+    radii = radii[0] if radii else np.full(len(pos), float(radius))
+    width, height = size if isinstance(size, tuple) else (size, size)
+    # What the scenario produced, which can fall short of `count`
+    result["particles"] = len(pos)
+    result["world"] = size
+    sim = None
+    try:
+        sim, step = create_simulation(strategy, width, height, pos, velocity, radii, threads, checkpoint)
+        if strategy in fixed_grid:
+            cell_size = sim.grid.grid_size if hasattr(sim.grid, "grid_size") else sim.grid_size
+            if 2 * radii.max(initial=0) > cell_size:
+                result["skipped"] = f"cells of {cell_size} are smaller than the largest particle"
+                return result
+        totals, pair_tests = instrument(sim)
+        step(dt)  # warm up
+        totals.clear()
+        if hasattr(sim, "pool"):
+            sim.pool.reset_stats()
+        tests = pair_tests()
+        done = 0
+        start = time.perf_counter()
+        while done < steps and time.perf_counter() - start < budget:
+            step(dt)
+            done += 1
+        elapsed = time.perf_counter() - start
+    except Exception as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+        return result
+    finally:
+        if hasattr(sim, "close"):
+            sim.close()
+        if hasattr(sim, "pool"):
+            sim.pool.close()
+    result["steps"] = done
+    result["steps_per_sec"] = done / elapsed
+    result["phase_ms"] = {name: total * 1000 / done for name, total in totals.items()}
+    result["pair_tests_per_step"] = (pair_tests() - tests) / done
+    if hasattr(sim, "pool"):
+        result["pool"] = sim.pool.stats()
+    if getattr(sim, "neighbor_list", None) is not None:
+        result["neighbor_list"] = sim.neighbor_list.stats()
+    if getattr(sim, "sleep", None) is not None:
+        result["sleep"] = sim.sleep.stats()
+    if getattr(sim, "scheduler", None) is not None:
+        result["substeps"] = sim.scheduler.stats()
+    if getattr(sim, "grid_tuner", None) is not None:
+        result["grid_tuner"] = {"grid_size": sim.grid.grid_size, **sim.grid_tuner.stats()}
+    if hasattr(getattr(sim, "broad_phase", None), "stats"):
+        result["broad_phase"] = sim.broad_phase.stats()
+    if getattr(sim, "kdtree", None) is not None:
+        result["kdtree"] = sim.kdtree.stats()
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every engine on the same seeded workloads")
+    parser.add_argument("--strategies", nargs="+", default=[name for name in strategies if name not in broken], choices=list(strategies))
+    parser.add_argument("--scenarios", nargs="+", default=list(scenarios), choices=list(scenarios))
+    parser.add_argument("--counts", nargs="+", type=int, default=counts)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--budget", type=float, default=30, help="seconds per case")
+    parser.add_argument("--output", help="JSON lines file, stdout if omitted")
+    parser.add_argument("--checkpoint", help="start every strategy from this Engine checkpoint instead of the scenarios")
+    args = parser.parse_args(argv)
+    if args.checkpoint:
+        scenarios["checkpoint"], count = checkpoint_scenario(args.checkpoint)
+        args.scenarios, args.counts = ["checkpoint"], [count]
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for scenario in args.scenarios:
+            for count in args.counts:
+                for strategy in args.strategies:
+                    result = run_case(strategy, scenario, count, args.steps, args.seed, args.threads, args.budget, args.checkpoint)
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
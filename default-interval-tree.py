@@ -5,11 +5,15 @@ from collections import defaultdict
 from Particle import Particle  # Assuming you have a Particle class defined elsewhere
 from Helper import Helper  # Assuming you have a Helper class defined elsewhere
 import threading
+import numpy as np
+from SweepAndPrune import SweepAndPrune
+from SpriteBatch import SpriteBatch
 
 # Constants
 num_threads = 1
 width, height = 900, 900
 grid_size = 30  # Grid size must divide width in half
+use_sweep_and_prune = True
 gravity = Vector2(0, 9.81)
 
 def build_tree(width, grid_size):
@@ -108,7 +112,9 @@ class Simulation:
         self.height = height
         self.particles = []
         self.screen = pygame.display.set_mode((width, height))
+        self.sprite_batch = SpriteBatch()
         self.interval_tree = IntervalTree(width, grid_size, self.screen)
+        self.sweep = SweepAndPrune()
         self.clock = pygame.time.Clock()
         self.thread_count = threads
         self.elapsed_time = 0
@@ -125,12 +131,23 @@ class Simulation:
         return self.interval_tree.query_neighbors(self.interval_tree.root, particle)
 
     def solve_collisions(self):
+        if use_sweep_and_prune:
+            self.solve_collisions_sweep()
+            return
         self.update_interval_tree()
         for particle in self.particles:
             neighbors = self.get_neighbors(particle)
             for other_particle in neighbors:
                 self.resolve_collision(particle, other_particle)
 
+    def solve_collisions_sweep(self):
+        pos = np.array([(particle.pos.x, particle.pos.y) for particle in self.particles]).reshape(-1, 2)
+        radius = np.array([particle.radius for particle in self.particles], dtype=float)
+        i, j = self.sweep.pairs(pos, radius)
+        particles = self.particles
+        for a, b in zip(i.tolist(), j.tolist()):
+            self.resolve_collision(particles[a], particles[b])
+
     def resolve_collision(self, p1, p2):
         if p1 is p2:
             return
@@ -160,9 +177,9 @@ class Simulation:
             particle.update(dt)
 
     def draw(self):
-        for particle in self.particles:
-            pygame.draw.circle(self.screen, particle.color, (int(particle.pos.x), int(particle.pos.y)), particle.radius)
-        self.interval_tree.draw(self.interval_tree.root)
+        self.sprite_batch.draw_particles(self.screen, self.particles)
+        if not use_sweep_and_prune:
+            self.interval_tree.draw(self.interval_tree.root)
 
     def handle_events(self):
         for event in pygame.event.get():
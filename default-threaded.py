@@ -4,6 +4,7 @@ from pygame import Vector2
 from collections import defaultdict
 from Particle import Particle
 from Helper import Helper
+from SpriteBatch import SpriteBatch
 from multiprocessing import Pool, Array
 
 # Constants
@@ -50,6 +51,7 @@ class Simulation:
         self.grid = defaultdict(list)
         self.grid_size = grid_size
         self.screen = pygame.display.set_mode((width, height))
+        self.sprite_batch = SpriteBatch()
         self.clock = pygame.time.Clock()
         self.thread_count = threads
         self.elapsed_time = 0
@@ -77,8 +79,7 @@ class Simulation:
             particle.update(dt)
         
     def draw(self):
-        for particle in self.particles:
-            pygame.draw.circle(self.screen, particle.color, (int(particle.pos.x), int(particle.pos.y)), particle.radius)
+        self.sprite_batch.draw_particles(self.screen, self.particles)
 
     def handle_events(self):
         for event in pygame.event.get():
@@ -3,12 +3,15 @@ from pygame import Vector2
 from collections import defaultdict
 from Particle import Particle
 from Helper import Helper
-from kdtree import KDTree
+import numpy as np
+from kdtree import KDTree, ArrayKDTree
+from SpriteBatch import SpriteBatch
 
 # Constants
 num_threads = 1
 width, height = 900, 900
 grid_size = 30
+kdtree_mode = "refit"  # "object", "rebuild" or "refit"
 gravity = Vector2(0, 9.81)
 
 class Simulation:
@@ -21,14 +24,30 @@ class Simulation:
         self.grid = defaultdict(list)
         self.grid_size = grid_size
         self.screen = pygame.display.set_mode((width, height))
+        self.sprite_batch = SpriteBatch()
         self.clock = pygame.time.Clock()
         self.thread_count = threads
         self.elapsed_time = 0
+        self.kdtree = None
 
     def add_particle(self, particle):
         self.particles.append(particle)
+        if self.kdtree is not None:
+            self.kdtree.insert(particle.pos)
 
     def solve_collisions(self):
+        if kdtree_mode != "object":
+            collision_pairs = self.find_pairs_array()
+        else:
+            collision_pairs = self.find_pairs()
+
+        # Usando uma pilha para resolver as colisões
+        collision_stack = collision_pairs[:]
+        while collision_stack:
+            p1, p2 = collision_stack.pop()
+            self.resolve_collision(p1, p2)
+
+    def find_pairs(self):
         kdtree = KDTree(self.particles)
         collision_pairs = []
         
@@ -37,12 +56,18 @@ class Simulation:
             for other in nearby_particles:
                 if other != particle:
                     collision_pairs.append((particle, other))
-
-        # Usando uma pilha para resolver as colisões
-        collision_stack = collision_pairs[:]
-        while collision_stack:
-            p1, p2 = collision_stack.pop()
-            self.resolve_collision(p1, p2)
+        return collision_pairs
+
+    def find_pairs_array(self):
+        pos = np.array([(particle.pos.x, particle.pos.y) for particle in self.particles]).reshape(-1, 2)
+        radius = np.array([particle.radius for particle in self.particles])
+        if self.kdtree is None or kdtree_mode == "rebuild":
+            self.kdtree = ArrayKDTree(pos)
+        else:
+            self.kdtree.refit(pos)
+        i, j = self.kdtree.query_batch(pos, radius * 2)
+        particles = self.particles
+        return [(particles[a], particles[b]) for a, b in zip(i.tolist(), j.tolist()) if a != b]
 
     def resolve_collision(self, p1: Particle, p2: Particle):
         if p1 is p2:
@@ -74,8 +99,7 @@ class Simulation:
             particle.update(dt)
 
     def draw(self):
-        for particle in self.particles:
-            pygame.draw.circle(self.screen, particle.color, (int(particle.pos.x), int(particle.pos.y)), particle.radius)
+        self.sprite_batch.draw_particles(self.screen, self.particles)
 
     def handle_events(self):
         for event in pygame.event.get():
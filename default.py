@@ -1,12 +1,17 @@
+import numpy as np
 import pygame
 from pygame import Vector2
 from collections import defaultdict
 from Particle import Particle
 from Helper import Helper
+from ParticleArray import ParticleArray
+from Collision import NarrowPhase
+from SpriteBatch import SpriteBatch
 
 # Constants
 num_threads = 1
 width, height = 900, 900
+use_array = True
 grid_size = 30
 gravity = Vector2(0, 9.81)
 
@@ -20,6 +25,7 @@ class Simulation:
         self.grid = defaultdict(list)
         self.grid_size = grid_size
         self.screen = pygame.display.set_mode((width, height))
+        self.sprite_batch = SpriteBatch()
         self.clock = pygame.time.Clock()
         self.thread_count = threads
         self.elapsed_time = 0
@@ -62,8 +68,7 @@ class Simulation:
             particle.update(dt)
         
     def draw(self):
-        for particle in self.particles:
-            pygame.draw.circle(self.screen, particle.color, (int(particle.pos.x), int(particle.pos.y)), particle.radius)
+        self.sprite_batch.draw_particles(self.screen, self.particles)
 
     def handle_events(self):
         for event in pygame.event.get():
@@ -89,12 +94,12 @@ class Simulation:
                 spawn_particle = Particle((20, 20), 10, Helper.get_color(len(self.particles)), width, height)
                 spawn_particle2 = Particle((20, 40), 10, Helper.get_color(len(self.particles)), width, height)
                 spawn_particle3 = Particle((20, 60), 10, Helper.get_color(len(self.particles)), width, height)
-                self.add_particle(spawn_particle)
-                self.add_particle(spawn_particle2)
-                self.add_particle(spawn_particle3)
                 spawn_particle.add_velocity(Vector2(4, 0))
                 spawn_particle2.add_velocity(Vector2(4, 0))
                 spawn_particle3.add_velocity(Vector2(4, 0))
+                self.add_particle(spawn_particle)
+                self.add_particle(spawn_particle2)
+                self.add_particle(spawn_particle3)
                 self.elapsed_time -= spawn_delay
             elif self.fps < 60 and dt > 0.016:
                 spawn = False
@@ -108,8 +113,41 @@ class Simulation:
             pygame.display.flip()
 
 
-    
+class ArraySimulation(Simulation):
+    # Same engine running on a ParticleArray store instead of Particle objects
+    def __init__(self, width, height, threads=1):
+        super().__init__(width, height, threads)
+        self.particles = ParticleArray(width, height)
+        self.narrow_phase = NarrowPhase()
+
+    def add_particle(self, particle):
+        self.particles.add_particle(particle)
+
+    def solve_collisions(self):
+        # Still every pair, but tested in one batch by the narrow phase
+        # instead of a Python loop over count^2 index pairs
+        i, j = np.triu_indices(len(self.particles), 1)
+        self.narrow_phase.solve(self.particles.pos, self.particles.radius, i, j)
+
+    def update(self, dt):
+        substeps = 3
+        sub_dt = dt / substeps
+        for _ in range(substeps):
+            self.solve_collisions()
+            self.update_particles(sub_dt)
+            keys = pygame.key.get_pressed()
+            if keys[pygame.K_SPACE]:
+                self.particles.accelerate((0, -2000))
+
+    def update_particles(self, dt):
+        self.particles.accelerate(gravity * 100)
+        self.particles.integrate(dt)
+
+    def draw(self):
+        particles = self.particles
+        self.sprite_batch.draw(self.screen, particles.pos, particles.radius, particles.update_colors())
+
 
 if __name__ == "__main__":
-    sim = Simulation(width, height, num_threads)
+    sim = (ArraySimulation if use_array else Simulation)(width, height, num_threads)
     sim.run()
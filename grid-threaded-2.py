@@ -4,7 +4,8 @@ from pygame import Vector2
 from collections import defaultdict
 from Particle import Particle
 from Helper import Helper
-import threading
+from WorkerPool import WorkerPool
+from SpriteBatch import SpriteBatch
 
 # Constants
 num_threads = 8
@@ -22,8 +23,10 @@ class Simulation:
         self.grid = defaultdict(list)
         self.grid_size = grid_size
         self.screen = pygame.display.set_mode((width, height))
+        self.sprite_batch = SpriteBatch()
         self.clock = pygame.time.Clock()
         self.thread_count = threads
+        self.pool = WorkerPool(threads)
         self.elapsed_time = 0
 
     def add_particle(self, particle):
@@ -31,18 +34,15 @@ class Simulation:
 
     def update_grid(self):
         self.grid.clear()
-        
-        threads = []
-        
+        self.pool.run("update_grid", self.update_grid_thread, self.particle_ranges())
+
+    def particle_ranges(self, *args):
+        ranges = []
         for i in range(self.thread_count):
             start_index = i * len(self.particles) // self.thread_count
             end_index = None if i == self.thread_count - 1 else (i + 1) * len(self.particles) // self.thread_count
-            thread = threading.Thread(target=self.update_grid_thread, args=(start_index, end_index))
-            thread.start()
-            threads.append(thread)
-            
-        for thread in threads:
-            thread.join()
+            ranges.append((start_index, end_index) + args)
+        return ranges
             
     def update_grid_thread(self, start_index, end_index):
         for particle in self.particles[start_index:end_index]:
@@ -58,31 +58,17 @@ class Simulation:
         return neighbors
 
     def solve_collisions(self):
-        threads = []
         slices_count = self.thread_count * 2
         slice_cells = width // grid_size // slices_count  
         
-        # process half of the grid in parallel
-        for i in range(self.thread_count):
-            start_cell = (2 * i * slice_cells, 0)
-            end_cell = (start_cell[0] + slice_cells, height // grid_size)
-            thread = threading.Thread(target=self.solve_collisions_thread, args=(start_cell, end_cell))
-            thread.start()
-            threads.append(thread)
-        
-        for thread in threads:
-            thread.join()
-        
-        # process the other half of the grid in parallel
-        for i in range(self.thread_count):
-            start_cell = ((2 * i + 1) * slice_cells, 0)
-            end_cell = (start_cell[0] + slice_cells, height // grid_size)
-            thread = threading.Thread(target=self.solve_collisions_thread, args=(start_cell, end_cell))
-            thread.start()
-            threads.append(thread)
-        
-        for thread in threads:
-            thread.join()
+        # process half of the grid in parallel, then the other half
+        for offset in range(2):
+            ranges = []
+            for i in range(self.thread_count):
+                start_cell = ((2 * i + offset) * slice_cells, 0)
+                end_cell = (start_cell[0] + slice_cells, height // grid_size)
+                ranges.append((start_cell, end_cell))
+            self.pool.run("solve_collisions", self.solve_collisions_thread, ranges)
             
     def solve_collisions_thread(self, start_cell, end_cell):
         for cell_x in range(start_cell[0], end_cell[0]):
@@ -121,17 +107,7 @@ class Simulation:
                     particle.accelerate(Vector2(0, -2000))
         
     def update_particles(self, dt):
-        threads = []
-        
-        for i in range(self.thread_count):
-            start_index = i * len(self.particles) // self.thread_count
-            end_index = None if i == self.thread_count - 1 else (i + 1) * len(self.particles) // self.thread_count
-            thread = threading.Thread(target=self.update_particles_thread, args=(start_index, end_index, dt))
-            thread.start()
-            threads.append(thread)
-        
-        for thread in threads:
-            thread.join()
+        self.pool.run("update_particles", self.update_particles_thread, self.particle_ranges(dt))
             
     def update_particles_thread(self, start_index, end_index, dt):
         for particle in self.particles[start_index:end_index]:
@@ -139,8 +115,7 @@ class Simulation:
             particle.update(dt)
         
     def draw(self):
-        for particle in self.particles:
-            particle.draw(self.screen)
+        self.sprite_batch.draw_particles(self.screen, self.particles)
 
     def handle_events(self):
         for event in pygame.event.get():
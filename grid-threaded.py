@@ -4,7 +4,8 @@ from pygame import Vector2
 from collections import defaultdict
 from Particle import Particle
 from Helper import Helper
-import threading
+from WorkerPool import WorkerPool
+from SpriteBatch import SpriteBatch
 
 # Constants
 num_threads = 1
@@ -22,8 +23,10 @@ class Simulation:
         self.grid_size = grid_size
         self.grid = [[] for _ in range(width // grid_size * height // grid_size)]
         self.screen = pygame.display.set_mode((width, height))
+        self.sprite_batch = SpriteBatch()
         self.clock = pygame.time.Clock()
         self.thread_count = threads
+        self.pool = WorkerPool(threads)
         self.elapsed_time = 0
 
     def add_particle(self, particle):
@@ -32,17 +35,13 @@ class Simulation:
     def update_grid(self):
         self.grid = [[] for _ in range(width // grid_size * height // grid_size)]
         
-        threads = []
+        ranges = []
         process_amount = len(self.particles) // self.thread_count
         for i in range(self.thread_count):
             start_index = i * process_amount
             end_index = (i + 1) * process_amount if i < self.thread_count - 1 else None
-            thread = threading.Thread(target=self.update_grid_thread, args=(start_index, end_index))
-            thread.start()
-            threads.append(thread)
-            
-        for thread in threads:
-            thread.join()
+            ranges.append((start_index, end_index))
+        self.pool.run("update_grid", self.update_grid_thread, ranges)
             
     def update_grid_thread(self, start_index, end_index):
         for particle in self.particles[start_index:end_index]:
@@ -53,31 +52,17 @@ class Simulation:
     
 
     def solve_collisions(self):
-        threads = []
         slices_count = self.thread_count * 2
         slice_size = len(self.grid) // slices_count
         
-        # process half of the grid in parallel
-        for i in range(self.thread_count):
-            start = 2 * i * slice_size
-            end = start + slice_size
-            thread = threading.Thread(target=self.solve_collisions_thread, args=(start, end))
-            thread.start()
-            threads.append(thread)
-        
-        for thread in threads:
-            thread.join()
-        
-        # process the other half of the grid in parallel
-        for i in range(self.thread_count, slices_count):
-            start = (2 * i + 1) * slice_size
-            end = start + slice_size
-            thread = threading.Thread(target=self.solve_collisions_thread, args=(start, end))
-            thread.start()
-            threads.append(thread)
-            
-        for thread in threads:
-            thread.join()
+        # process half of the grid in parallel, then the other half
+        for offset in range(2):
+            ranges = []
+            for i in range(self.thread_count):
+                start = (2 * i + offset) * slice_size
+                end = start + slice_size
+                ranges.append((start, end))
+            self.pool.run("solve_collisions", self.solve_collisions_thread, ranges)
         
     def solve_collisions_thread(self, start, end):
         cell_x = start % self.grid_size
@@ -102,17 +87,12 @@ class Simulation:
                     particle.accelerate(Vector2(0, -2000))
         
     def update_particles(self, dt):
-        threads = []
-        
+        ranges = []
         for i in range(self.thread_count):
             start_index = i * len(self.particles) // self.thread_count
             end_index = None if i == self.thread_count - 1 else (i + 1) * len(self.particles) // self.thread_count
-            thread = threading.Thread(target=self.update_particles_thread, args=(start_index, end_index, dt))
-            thread.start()
-            threads.append(thread)
-        
-        for thread in threads:
-            thread.join()
+            ranges.append((start_index, end_index, dt))
+        self.pool.run("update_particles", self.update_particles_thread, ranges)
             
     def update_particles_thread(self, start_index, end_index, dt):
         for particle in self.particles[start_index:end_index]:
@@ -132,8 +112,7 @@ class Simulation:
                 p2.pos += half_overlap        
 
     def draw(self):
-        for particle in self.particles:
-            particle.draw(self.screen)
+        self.sprite_batch.draw_particles(self.screen, self.particles)
 
     def handle_events(self):
         for event in pygame.event.get():
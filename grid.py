@@ -4,13 +4,25 @@ from pygame import Vector2
 from collections import defaultdict
 from Particle import Particle
 from Helper import Helper
+from ParticleArray import ParticleArray
+from UniformGrid import UniformGrid
+from Collision import NarrowPhase
+from NeighborList import NeighborList
+from SleepTracker import SleepTracker
+from SpriteBatch import SpriteBatch
 import threading
+import numpy as np
 
 # Constants
 num_threads = 8
 width, height = 900, 900
+use_array = True
+skin = 4
 grid_size = 25
 gravity = Vector2(0, 9.81)
+# Forward half of the 3x3 neighborhood. A cell paired with itself and these
+# four visits every pair of neighboring cells exactly once.
+half_shell = ((1, -1), (1, 0), (1, 1), (0, 1))
 
 class Simulation:
     def __init__(self, width, height, threads=1):
@@ -22,6 +34,7 @@ class Simulation:
         self.grid = defaultdict(list)
         self.grid_size = grid_size
         self.screen = pygame.display.set_mode((width, height))
+        self.sprite_batch = SpriteBatch()
         self.clock = pygame.time.Clock()
         self.thread_count = threads
         self.elapsed_time = 0
@@ -36,23 +49,36 @@ class Simulation:
             cell_y = int(particle.pos.y // self.grid_size)
             self.grid[(cell_x, cell_y)].append(particle)
 
-    def get_neighbors(self, cell_x, cell_y):
-        neighbors = []
-        for dx in range(-1, 2):
-            for dy in range(-1, 2):
-                neighbors.extend(self.grid[(cell_x + dx, cell_y + dy)])
-        return neighbors
+    def cell(self, cell_x, cell_y):
+        return self.grid.get((cell_x, cell_y), [])
+
+    def cell_pairs(self, cell_x, cell_y):
+        # The cell with itself, then with each occupied forward neighbor
+        cell = self.cell(cell_x, cell_y)
+        if not cell:
+            return
+        yield cell, cell
+        for dx, dy in half_shell:
+            other = self.cell(cell_x + dx, cell_y + dy)
+            if other:
+                yield cell, other
 
     def solve_collisions(self):
-        for cell_x in range(int(width // self.grid_size)):
-            for cell_y in range(int(height // self.grid_size)):
-                self.solve_collisions_cell(cell_x, cell_y)
-                    
+        # Occupied cells only, the world need not be a multiple of grid_size
+        for cell_x, cell_y in list(self.grid):
+            self.solve_collisions_cell(cell_x, cell_y)
+
     def solve_collisions_cell(self, cell_x, cell_y):
-        for particle in self.grid[(cell_x, cell_y)]:
-            neighbors = self.get_neighbors(cell_x, cell_y)
-            for other_particle in neighbors:
-                self.resolve_collision(particle, other_particle)    
+        # Each unordered pair is resolved once
+        for cell, other in self.cell_pairs(cell_x, cell_y):
+            if other is cell:
+                for k, particle in enumerate(cell):
+                    for other_particle in cell[k + 1:]:
+                        self.resolve_collision(particle, other_particle)
+            else:
+                for particle in cell:
+                    for other_particle in other:
+                        self.resolve_collision(particle, other_particle)
     
     def resolve_collision(self, p1: Particle, p2: Particle):
         if p1 is p2:
@@ -86,8 +112,7 @@ class Simulation:
             particle.update(dt)
         
     def draw(self):
-        for particle in self.particles:
-            pygame.draw.circle(self.screen, particle.color, (int(particle.pos.x), int(particle.pos.y)), particle.radius)
+        self.sprite_batch.draw_particles(self.screen, self.particles)
 
     def handle_events(self):
         for event in pygame.event.get():
@@ -113,12 +138,12 @@ class Simulation:
                 spawn_particle = Particle((20, 20), 10, Helper.get_color(len(self.particles)), width, height)
                 spawn_particle2 = Particle((20, 40), 10, Helper.get_color(len(self.particles)), width, height)
                 spawn_particle3 = Particle((20, 60), 10, Helper.get_color(len(self.particles)), width, height)
-                self.add_particle(spawn_particle)
-                self.add_particle(spawn_particle2)
-                self.add_particle(spawn_particle3)
                 spawn_particle.add_velocity(Vector2(4, 0))
                 spawn_particle2.add_velocity(Vector2(4, 0))
                 spawn_particle3.add_velocity(Vector2(4, 0))
+                self.add_particle(spawn_particle)
+                self.add_particle(spawn_particle2)
+                self.add_particle(spawn_particle3)
                 self.elapsed_time -= spawn_delay
             elif self.fps < 60 and dt > 0.016:
                 spawn = False
@@ -132,8 +157,69 @@ class Simulation:
             pygame.display.flip()
 
 
-    
+class ArraySimulation(Simulation):
+    # Same engine running on a ParticleArray store instead of Particle objects
+    def __init__(self, width, height, threads=1):
+        super().__init__(width, height, threads)
+        self.particles = ParticleArray(width, height)
+        self.grid = UniformGrid(width, height, self.grid_size)
+        self.narrow_phase = NarrowPhase()
+        self.neighbor_list = NeighborList(skin)
+        self.sleep = SleepTracker()
+
+    def add_particle(self, particle):
+        self.particles.add_particle(particle)
+
+    def save_checkpoint(self, path):
+        with open(path, "wb") as file:
+            np.savez(file, **self.particles.state(), world=(self.width, self.height), elapsed_time=self.elapsed_time)
+
+    def load_checkpoint(self, path):
+        with np.load(path) as data:
+            if tuple(data["world"].tolist()) != (self.width, self.height):
+                raise ValueError(f"checkpoint is for a {data['world'][0]}x{data['world'][1]} world, not {self.width}x{self.height}")
+            self.particles.load_state(data)
+            self.elapsed_time = float(data["elapsed_time"])
+        self.neighbor_list.invalidate()
+        self.sleep.resize(0)
+
+    def update_grid(self):
+        self.grid.rebuild(self.particles.pos)
+
+    def find_candidates(self):
+        self.update_grid()
+        return self.grid.candidate_pairs()
+
+    def solve_collisions(self):
+        # Reuse the neighbor list while it is valid, the grid is rebuilt only
+        # when it goes stale
+        i, j = self.neighbor_list.pairs(self.particles.pos, self.particles.radius, self.grid_size, self.find_candidates)
+        i, j, weight = self.sleep.pairs(self.particles.pos, self.particles.radius, i, j)
+        self.narrow_phase.solve(self.particles.pos, self.particles.radius, i, j, weight)
+
+    def update(self, dt):
+        substeps = 3
+        sub_dt = dt / substeps
+        self.sleep.begin_step(self.particles.pos)
+        for _ in range(substeps):
+            self.solve_collisions()
+            self.update_particles(sub_dt)
+            keys = pygame.key.get_pressed()
+            if keys[pygame.K_SPACE]:
+                self.sleep.wake()
+                self.particles.accelerate((0, -2000))
+        self.sleep.end_step(self.particles.pos, self.particles.prev_pos, self.particles.radius)
+
+    def update_particles(self, dt):
+        index = self.sleep.awake_index()
+        self.particles.accelerate(gravity * 100, index)
+        self.particles.integrate(dt, index)
+
+    def draw(self):
+        particles = self.particles
+        self.sprite_batch.draw(self.screen, particles.pos, particles.radius, particles.update_colors())
+
 
 if __name__ == "__main__":
-    sim = Simulation(width, height, num_threads)
+    sim = (ArraySimulation if use_array else Simulation)(width, height, num_threads)
     sim.run()
@@ -1,3 +1,5 @@
+import numpy as np
+
 class KDTree:
     def __init__(self, particles, depth=0):
         if not particles:
@@ -47,3 +49,160 @@ class KDTree:
             self.right.query(point, radius, found, depth + 1)
 
         return found
+
+
+class ArrayKDTree:
+    # Implicit KD-tree over coordinate arrays. Node k has children 2k + 1 and
+    # 2k + 2, covers perm[lo[k]:hi[k]] and keeps the bounding box of its
+    # points. All leaves sit at the same depth and hold at most leaf_size
+    # particles. Build and queries are loops over levels, never recursion.
+    #
+    # refit() keeps the topology and only recomputes the boxes for moved
+    # points. Subtrees whose boxes grew too much are re-partitioned in place,
+    # and the whole tree is rebuilt once the average number of nodes a query
+    # visits degrades past rebuild_ratio times its value after the last build.
+    def __init__(self, pos, leaf_size=8, rebuild_ratio=1.5, growth_limit=2.0):
+        self.leaf_size = leaf_size
+        self.rebuild_ratio = rebuild_ratio
+        self.growth_limit = growth_limit
+        self.builds = 0
+        self.refits = 0
+        self.partial_rebuilds = 0
+        self.build(pos)
+
+    def build(self, pos):
+        self.pos = np.asarray(pos, dtype=float)
+        count = len(self.pos)
+        self.depth = max(int(np.ceil(np.log2(max(count, 1) / self.leaf_size))), 0)
+        node_count = 2 ** (self.depth + 1) - 1
+        self.perm = np.arange(count)
+        self.pending = np.zeros(0, dtype=np.int64)
+        self.lo = np.zeros(node_count, dtype=np.int64)
+        self.hi = np.zeros(node_count, dtype=np.int64)
+        self.hi[0] = count
+        self.partition(0)
+
+        self.box_min = np.full((node_count, 2), np.inf)
+        self.box_max = np.full((node_count, 2), -np.inf)
+        self.refit_boxes()
+        self.check_level = min(self.depth, 4)
+        self.build_area = self.box_area(self.level_nodes(self.check_level))
+        self.baseline_visits = None
+        self.visits = None
+        self.builds += 1
+
+    def level_nodes(self, depth, root=0):
+        # Nodes `depth` levels below root (absolute depth when root is 0)
+        first = (root + 1) * 2 ** depth - 1
+        return np.arange(first, first + 2 ** depth)
+
+    def partition(self, root):
+        # Median partition of the subtree under root, level by level
+        root_depth = int(np.log2(root + 1))
+        for depth in range(self.depth - root_depth):
+            axis = (root_depth + depth) % 2
+            for node in self.level_nodes(depth, root).tolist():
+                lo, hi = self.lo[node], self.hi[node]
+                mid = (lo + hi) // 2
+                if mid > lo:
+                    part = self.perm[lo:hi]
+                    order = np.argpartition(self.pos[part, axis], mid - lo)
+                    self.perm[lo:hi] = part[order]
+                self.lo[2 * node + 1], self.hi[2 * node + 1] = lo, mid
+                self.lo[2 * node + 2], self.hi[2 * node + 2] = mid, hi
+
+    @property
+    def leaves(self):
+        return self.level_nodes(self.depth)
+
+    def box_area(self, nodes):
+        extent = np.maximum(self.box_max[nodes] - self.box_min[nodes], 0)
+        return extent[:, 0] * extent[:, 1]
+
+    def refit_boxes(self):
+        # Leaf boxes from the points, then internal boxes bottom-up
+        leaves = self.leaves
+        lo = self.lo[leaves]
+        filled = self.hi[leaves] > lo
+        if filled.any():
+            points = self.pos[self.perm]
+            self.box_min[leaves[filled]] = np.minimum.reduceat(points, lo[filled])
+            self.box_max[leaves[filled]] = np.maximum.reduceat(points, lo[filled])
+        for depth in range(self.depth - 1, -1, -1):
+            nodes = self.level_nodes(depth)
+            self.box_min[nodes] = np.minimum(self.box_min[2 * nodes + 1], self.box_min[2 * nodes + 2])
+            self.box_max[nodes] = np.maximum(self.box_max[2 * nodes + 1], self.box_max[2 * nodes + 2])
+
+    def insert(self, point):
+        # New points wait in a pending list that queries scan directly,
+        # they join the tree on the next full build
+        self.pending = np.append(self.pending, len(self.pos))
+        self.pos = np.vstack((self.pos, np.asarray(point, dtype=float).reshape(1, 2)))
+
+    def refit(self, pos):
+        self.pos = np.asarray(pos, dtype=float)
+        degraded = self.baseline_visits is not None and self.visits > self.rebuild_ratio * self.baseline_visits
+        if degraded or len(self.pending) > len(self.perm) // 4:
+            self.build(self.pos)
+            return
+        self.refits += 1
+        self.refit_boxes()
+
+        nodes = self.level_nodes(self.check_level)
+        grown = nodes[self.box_area(nodes) > self.growth_limit * np.maximum(self.build_area, 1)]
+        if len(grown):
+            for node in grown.tolist():
+                self.partition(node)
+            self.partial_rebuilds += len(grown)
+            self.refit_boxes()
+            self.build_area[grown - nodes[0]] = self.box_area(grown)
+
+    def stats(self):
+        return {
+            "builds": self.builds,
+            "refits": self.refits,
+            "partial_rebuilds": self.partial_rebuilds,
+            "pending": len(self.pending),
+            "visits_per_query": self.visits,
+            "baseline_visits": self.baseline_visits,
+        }
+
+    def query_batch(self, points, radii):
+        # All (query, particle) index pairs with distance <= the query radius.
+        # The frontier of (query, node) pairs is advanced one level at a time.
+        points = np.asarray(points, dtype=float)
+        radii_sq = np.broadcast_to(np.asarray(radii, dtype=float) ** 2, (len(points),))
+        x, y = points[:, 0], points[:, 1]
+        min_x, min_y = self.box_min[:, 0].copy(), self.box_min[:, 1].copy()
+        max_x, max_y = self.box_max[:, 0].copy(), self.box_max[:, 1].copy()
+        # Walking queries in tree order keeps the frontier gathers local
+        query = self.perm.copy() if len(points) == len(self.perm) else np.arange(len(points))
+        node = np.zeros(len(points), dtype=np.int64)
+        visits = 0
+        for depth in range(self.depth + 1):
+            visits += len(node)
+            qx, qy = x[query], y[query]
+            gap_x = np.maximum(np.maximum(min_x[node] - qx, qx - max_x[node]), 0)
+            gap_y = np.maximum(np.maximum(min_y[node] - qy, qy - max_y[node]), 0)
+            visit = gap_x * gap_x + gap_y * gap_y <= radii_sq[query]
+            query, node = query[visit], node[visit]
+            if depth < self.depth:
+                query = np.repeat(query, 2)
+                node = 2 * np.repeat(node, 2) + 1
+                node[1::2] += 1
+
+        lo = self.lo[node]
+        counts = self.hi[node] - lo
+        query = np.repeat(query, counts)
+        offsets = np.repeat(lo - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        found = self.perm[offsets]
+        if len(self.pending):
+            query = np.concatenate((query, np.repeat(np.arange(len(points)), len(self.pending))))
+            found = np.concatenate((found, np.tile(self.pending, len(points))))
+        delta = points[query] - self.pos[found]
+        hit = (delta * delta).sum(axis=1) <= radii_sq[query]
+
+        self.visits = visits / max(len(points), 1)
+        if self.baseline_visits is None:
+            self.baseline_visits = self.visits
+        return query[hit], found[hit]
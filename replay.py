@@ -0,0 +1,75 @@
+import argparse
+import pygame
+from Trajectory import TrajectoryReader
+from SpriteBatch import SpriteBatch
+
+# Constants
+fps = 80
+seek_frames = 80
+
+class Player:
+    # Plays a recorded trajectory straight from the memory map, no engine or
+    # Particle objects involved. Space pauses, left and right seek one second
+    # and home jumps to the start. `speed` multiplies the frame rate, 0 plays
+    # as fast as frames can be drawn; up and down double and halve it.
+    def __init__(self, path, speed=1.0):
+        pygame.init()
+        self.speed = speed
+        self.reader = TrajectoryReader(path)
+        self.screen = pygame.display.set_mode((self.reader.width, self.reader.height))
+        self.sprite_batch = SpriteBatch()
+        self.clock = pygame.time.Clock()
+        self.running = True
+        self.paused = False
+        self.current = 0
+
+    def seek(self, frame):
+        self.current = max(0, min(frame, len(self.reader) - 1))
+
+    def draw(self):
+        frame = self.reader.frame(self.current)
+        self.sprite_batch.draw(self.screen, frame["pos"], frame["radius"], frame["color"])
+
+    def handle_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.running = False
+                elif event.key == pygame.K_SPACE:
+                    self.paused = not self.paused
+                elif event.key == pygame.K_LEFT:
+                    self.seek(self.current - seek_frames)
+                elif event.key == pygame.K_RIGHT:
+                    self.seek(self.current + seek_frames)
+                elif event.key == pygame.K_HOME:
+                    self.seek(0)
+                elif event.key == pygame.K_UP and self.speed:
+                    self.speed *= 2
+                elif event.key == pygame.K_DOWN and self.speed:
+                    self.speed /= 2
+
+    def run(self):
+        if len(self.reader) == 0:
+            return
+        while self.running:
+            self.clock.tick(fps * self.speed)
+            self.handle_events()
+            speed = f"{self.speed:g}x" if self.speed else "uncapped"
+            pygame.display.set_caption(f"Frame: {self.current + 1}/{len(self.reader)}, Time: {self.reader.time(self.current):.2f}, FPS: {self.clock.get_fps():.2f}, Speed: {speed}")
+
+            self.screen.fill((0, 0, 0))
+            self.draw()
+            pygame.display.flip()
+            if not self.paused:
+                self.seek(self.current + 1)
+        pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="recorded trajectory directory")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier, 0 for uncapped")
+    args = parser.parse_args()
+    Player(args.path, args.speed).run()
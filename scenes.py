@@ -0,0 +1,91 @@
+import math
+import numpy as np
+
+# Scene generators. Each returns an (n, 2) array of particle centers for
+# Engine.add_particles. Boxes are (left, top, right, bottom) in screen
+# coordinates and are filled from the bottom up, like particles settle.
+
+def lattice(box, radius, count=None, gap=0.0, hexagonal=True):
+    # Touching circles in rows, every other row shifted by a radius when
+    # hexagonal. `gap` is extra space between neighbors.
+    left, top, right, bottom = box
+    spacing = 2 * radius + gap
+    row_height = spacing * math.sqrt(3) / 2 if hexagonal else spacing
+    cols = int((right - left - 2 * radius) // spacing) + 1
+    rows = int((bottom - top - 2 * radius) // row_height) + 1
+    if cols < 1 or rows < 1:
+        return np.zeros((0, 2))
+    row, col = np.divmod(np.arange(rows * cols), cols)
+    x = left + radius + col * spacing
+    if hexagonal:
+        x = x + (row % 2) * spacing / 2
+    y = bottom - radius - row * row_height
+    pos = np.column_stack((x, y))
+    # Shifted rows lose their last column if it sticks out
+    pos = pos[pos[:, 0] <= right - radius]
+    return pos[:count]
+
+def poisson_disk(box, radius, count=None, gap=0.0, rng=None, attempts=8):
+    # Random centers at least 2 * radius + gap apart. Darts are thrown into
+    # the empty cells of a background grid with cells of d / sqrt(2), so a
+    # cell holds at most one center and a conflict can only come from the
+    # 5x5 cells around it. Cells are visited in 9 phases of (x % 3, y % 3):
+    # darts of the same phase are at least two cells apart and never
+    # conflict, so a whole phase is tested at once. A cell is given up after
+    # `attempts` rejected darts, and throwing stops once `count` centers
+    # are placed; every round covers the whole box, so they stay uniform.
+    rng = np.random.default_rng(rng)
+    left, top, right, bottom = box
+    distance = 2 * radius + gap
+    low = np.array([left + radius, top + radius])
+    size = np.array([right - left - 2 * radius, bottom - top - 2 * radius])
+    if (size < 0).any():
+        return np.zeros((0, 2))
+    cell = distance / math.sqrt(2)
+    cols, rows = (np.floor(size / cell).astype(int) + 1).tolist()
+    # Center of each cell, nan while empty. The grid has a 2 cell border to
+    # skip bounds checks and is stored flat, column by column.
+    stride = rows + 4
+    gx = np.full((cols + 4) * stride, np.nan)
+    gy = np.full((cols + 4) * stride, np.nan)
+    cx, cy = np.meshgrid(np.arange(cols), np.arange(rows), indexing="ij")
+    cx, cy = cx.ravel(), cy.ravel()
+    phase = (cx % 3) * 3 + cy % 3
+    open_cells = [(cx[phase == k], cy[phase == k], np.zeros(np.count_nonzero(phase == k), dtype=int)) for k in range(9)]
+    offsets = [dx * stride + dy for dx in range(-2, 3) for dy in range(-2, 3) if (dx, dy) != (0, 0)]
+    limit = distance * distance
+
+    placed = 0
+    for _ in range(attempts):
+        for k, (x, y, failures) in enumerate(open_cells):
+            px = low[0] + (x + rng.random(len(x))) * cell
+            py = low[1] + (y + rng.random(len(x))) * cell
+            free = (px <= low[0] + size[0]) & (py <= low[1] + size[1])
+            flat = (x + 2) * stride + y + 2
+            for offset in offsets:
+                dx = gx[flat + offset] - px
+                dy = gy[flat + offset] - py
+                # nan compares False, so empty cells never block
+                free &= ~(dx * dx + dy * dy < limit)
+            gx[flat[free]] = px[free]
+            gy[flat[free]] = py[free]
+            placed += int(free.sum())
+            failures = failures + ~free
+            keep = ~free & (failures < attempts)
+            open_cells[k] = (x[keep], y[keep], failures[keep])
+        if count is not None and placed >= count:
+            break
+
+    pos = np.column_stack((gx, gy))
+    pos = pos[~np.isnan(gx)]
+    if count is not None and count < len(pos):
+        pos = pos[rng.choice(len(pos), count, replace=False)]
+    return pos
+
+def dam_break(width, height, radius, count, aspect=1.0, margin=2):
+    # A hexagonal block of `count` particles against the left wall and the
+    # floor, `aspect` times as tall as it is wide
+    area = count * (2 * radius) ** 2 * math.sqrt(3) / 2
+    block_width = min(math.sqrt(area / aspect), width - 2 * margin)
+    block_height = height - 2 * margin
+    return lattice((margin, margin, margin + block_width, margin + block_height), radius, count)